@@ -23,6 +23,7 @@ from datetime import datetime
 from collections import defaultdict
 from functools import reduce
 from tqdm import tqdm
+from ..utils.logloader import LogLoader
 
 
 class Event:
@@ -47,6 +48,7 @@ class LogParser:
         merge_percent=1,
         rex=[],
         keep_para=True,
+        load_workers=1,
     ):
         self.logformat = log_format
         self.path = indir
@@ -59,6 +61,7 @@ class LogParser:
         self.merged_events = []
         self.bins = defaultdict(dict)
         self.keep_para = keep_para
+        self.load_workers = load_workers
 
     def parse(self, logname):
         start_time = datetime.now()
@@ -203,49 +206,10 @@ class LogParser:
                 log = re.sub(currentRex, "<*>", log)
             return log
 
-        headers, regex = self.generate_logformat_regex(self.logformat)
-        self.df_log = self.log_to_dataframe(
-            os.path.join(self.path, self.logname), regex, headers, self.logformat
-        )
+        loader = LogLoader(self.logformat, n_workers=self.load_workers, non_ascii=None, renumber=True)
+        self.df_log = loader.load_to_dataframe(os.path.join(self.path, self.logname))
         self.df_log["Content_"] = self.df_log["Content"].map(preprocess)
 
-    def log_to_dataframe(self, log_file, regex, headers, logformat):
-        """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
-
-    def generate_logformat_regex(self, logformat):
-        """
-        Function to generate regular expression to split log messages
-
-        """
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
-
     def get_parameter_list(self, row):
         template_regex = re.sub(r"<.{1,5}>", "<*>", row["EventTemplate"])
         if "<*>" not in template_regex:
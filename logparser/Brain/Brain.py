@@ -20,6 +20,7 @@ from collections import Counter
 import os
 import pandas as pd
 import regex as re
+from ..utils.logloader import LogLoader
 
 RED = "\033[31m"
 RESET = "\033[0m"
@@ -36,11 +37,13 @@ class LogParser:
         threshold=2,
         delimeter=[],
         rex=[],
+        load_workers=1,
     ):
         self.logformat = log_format
         self.path = indir
         self.savePath = outdir
         self.rex = rex
+        self.load_workers = load_workers
         self.df_log = None
         self.logname = logname
         self.threshold = threshold
@@ -126,49 +129,10 @@ class LogParser:
             line = re.sub(currentRex, "<*>", line)
         return line
 
-    #使用generate_logformat_regex方法生成用于分析日志文件的正则表达式regex和标签列表headers。
-    # 然后，它使用log_to_dataframe方法将日志文件转换成一个pandas的DataFrame。
+    #使用共用的LogLoader按日志格式将日志文件转换成一个pandas的DataFrame，load_workers个进程并行读取。
     def load_data(self):
-        headers, regex = self.generate_logformat_regex(self.logformat)
-        self.df_log = self.log_to_dataframe(
-            os.path.join(self.path, self.logName), regex, headers, self.logformat
-        )
-
-    #接收一个logformat（日志格式）作为参数，返回一个用于分割日志信息的正则表达式以及相应的标题列表。函数通过拆分logformat参数并构建正则表达式模式完成此任务。
-    def generate_logformat_regex(self, logformat):
-        """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
-
-    #通用模块
-    def log_to_dataframe(self, log_file, regex, headers, logformat):
-        """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    pass
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        loader = LogLoader(self.logformat, n_workers=self.load_workers, non_ascii=None, renumber=True)
+        self.df_log = loader.load_to_dataframe(os.path.join(self.path, self.logName))
 
     def tuple_generate(self, group_len, tuple_vector, frequency_vector):
         """
@@ -20,6 +20,7 @@ import os
 import pandas as pd
 import hashlib
 from datetime import datetime
+from ..utils.logloader import LogLoader
 
 
 class Logcluster:
@@ -50,6 +51,7 @@ class LogParser:
         maxChild=100,
         rex=[],
         keep_para=True,
+        load_workers=1,
     ):
         """
         Attributes
@@ -61,6 +63,7 @@ class LogParser:
             maxChild : max number of children of an internal node
             logName : the name of the input file containing raw log messages
             savePath : the output path stores the file containing structured logs
+            load_workers : number of processes loading the input log file
         """
         self.path = indir
         self.depth = depth - 2
@@ -72,6 +75,7 @@ class LogParser:
         self.log_format = log_format
         self.rex = rex
         self.keep_para = keep_para
+        self.load_workers = load_workers
 
     def hasNumbers(self, s):
         return any(char.isdigit() for char in s)
@@ -314,51 +318,14 @@ class LogParser:
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - start_time))
 
     def load_data(self):
-        headers, regex = self.generate_logformat_regex(self.log_format)
-        self.df_log = self.log_to_dataframe(
-            os.path.join(self.path, self.logName), regex, headers, self.log_format
-        )
+        loader = LogLoader(self.log_format, n_workers=self.load_workers, non_ascii=None, renumber=True)
+        self.df_log = loader.load_to_dataframe(os.path.join(self.path, self.logName))
 
     def preprocess(self, line):
         for currentRex in self.rex:
             line = re.sub(currentRex, "<*>", line)
         return line
 
-    def log_to_dataframe(self, log_file, regex, headers, logformat):
-        """Function to traadwnsform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("[Warning] Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        print("Total lines: ", len(logdf))
-        return logdf
-
-    def generate_logformat_regex(self, logformat):
-        """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
-
     def get_parameter_list(self, row):
         template_regex = re.sub(r"<.{1,5}>", "<*>", row["EventTemplate"])
         if "<*>" not in template_regex:
@@ -21,6 +21,7 @@ import os
 import hashlib
 from collections import defaultdict
 from datetime import datetime
+from ...utils.logloader import LogLoader
 
 
 class LogParser(object):
@@ -32,11 +33,13 @@ class LogParser(object):
         threshold=0.9,
         predefined_templates=None,
         rex=[],
+        load_workers=1,
     ):
         self.path = indir
         self.savePath = outdir
         self.logformat = log_format
         self.rex = rex
+        self.load_workers = load_workers
         self.wordseqs = []
         self.df_log = pd.DataFrame()
         self.wordpos_count = defaultdict(int)
@@ -49,10 +52,8 @@ class LogParser(object):
         print("Parsing file: " + os.path.join(self.path, logname))
         self.logname = logname
         starttime = datetime.now()
-        headers, regex = self.generate_logformat_regex(self.logformat)
-        self.df_log = self.log_to_dataframe(
-            os.path.join(self.path, self.logname), regex, headers, self.logformat
-        )
+        loader = LogLoader(self.logformat, n_workers=self.load_workers, non_ascii=None, renumber=True)
+        self.df_log = loader.load_to_dataframe(os.path.join(self.path, self.logname))
         for idx, line in self.df_log.iterrows():
             line = line["Content"]
             if self.rex:
@@ -90,39 +91,3 @@ class LogParser(object):
         self.df_log.to_csv(
             os.path.join(self.savePath, self.logname + "_structured.csv"), index=False
         )
-
-    def log_to_dataframe(self, log_file, regex, headers, logformat):
-        """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
-
-    def generate_logformat_regex(self, logformat):
-        """
-        Function to generate regular expression to split log messages
-        """
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
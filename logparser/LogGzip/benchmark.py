@@ -7,10 +7,13 @@ import os
 import pandas as pd
 from  logparser.LogGzip.compressors import DefaultCompressor
 import time
-import zstandard as zstd
 
 input_dir = "../../data/loghub_24/"  # The input directory of log file
 output_dir = "LogGzip_result/"  # The output directory of parsing results
+# Compressor backend and level, e.g. `python benchmark.py zstd 19`
+# (gzip, zlib, deflate, bz2, lzma, zstd, lz4, brotli)
+compressor_name = sys.argv[1] if len(sys.argv) > 1 else "gzip"
+compressor_level = int(sys.argv[2]) if len(sys.argv) > 2 else None
 
 
 benchmark_settings = {
@@ -151,24 +154,26 @@ benchmark_settings = {
     },
 }
 
-benchmark_result = []
-for dataset, setting in benchmark_settings.items():
-    print("\n=== Evaluation on %s ===" % dataset)
+def run_dataset(setting, prune):
+    """Parses a dataset and returns (GA, FGA, FTA, PTA, RTA, parsing time,
+    compressions, compressions avoided by the similarity bound).
+    """
     indir = os.path.join(input_dir, os.path.dirname(setting["log_file"]))
     log_file = os.path.basename(setting["log_file"])
-    # (bz2", "lzma", "zlib",zstd", "brotli","gzip")
-    compressor = DefaultCompressor("gzip")
+    outdir = os.path.join(output_dir, "pruned") if prune else output_dir
+    compressor = DefaultCompressor(compressor_name, level=compressor_level)
     mask_digits = setting.get("mask_digits", False)
     delimiters = setting.get("delimiters", [r'\s+'])
     parser = LogParser(
         log_format=setting["log_format"],
         indir=indir,
-        outdir=output_dir,
+        outdir=outdir,
         rex=setting["regex"],
         threshold=setting["threshold"],
         mask_digits=mask_digits,
         compressor_instance=compressor,
-        delimiters=delimiters
+        delimiters=delimiters,
+        prune=prune,
     )
     start_time = time.time()
     parser.parse(log_file)
@@ -177,32 +182,50 @@ for dataset, setting in benchmark_settings.items():
     GA, FGA, FTA, PTA, RTA = evaluator.evaluate(
         groundtruth=os.path.join(indir, log_file + "_structured_rev.csv"),
         # groundtruth=os.path.join(indir, log_file + "_structured_corrected.csv"),
-        parsedresult=os.path.join(output_dir, log_file + "_structured.csv"),
+        parsedresult=os.path.join(outdir, log_file + "_structured.csv"),
     )
+    compressions = parser.templ_mgr.stats["compressions"]
+    avoided = parser.templ_mgr.stats["compressions_avoided"]
+    return [round(GA, 3), round(FGA, 3), round(FTA, 3), round(PTA, 3), round(RTA, 3), parsing_time,
+            compressions, avoided]
 
-    GA = round(GA, 3)
-    FGA = round(FGA, 3)
-    PTA = round(PTA, 3)
-    RTA = round(RTA, 3)
-    FTA = round(FTA, 3)
 
-    benchmark_result.append([dataset, GA, FGA, FTA, PTA, RTA, parsing_time])
+if __name__ == "__main__":
+    benchmark_result = []
+    for dataset, setting in benchmark_settings.items():
+        print("\n=== Evaluation on %s ===" % dataset)
+        GA, FGA, FTA, PTA, RTA, parsing_time, compressions, _ = run_dataset(setting, prune=False)
+        # the similarity bound is a heuristic, off by default, see
+        # LenmaTemplateManager.get_similarity_scores
+        print("\n=== Evaluation on %s with prune=True ===" % dataset)
+        pruned_GA, _, _, _, _, pruned_time, pruned_compressions, avoided = run_dataset(setting, prune=True)
 
-print("=== Overall evaluation results ===")
-df_result = pd.DataFrame(benchmark_result, columns=["Dataset", "GA", "FGA", "FTA", "PTA", "RTA", "P_Time"])
-df_result.set_index("Dataset", inplace=True)
+        benchmark_result.append([dataset, GA, FGA, FTA, PTA, RTA, parsing_time, compressions,
+                                 pruned_GA, pruned_time, pruned_compressions, avoided])
 
-average_GA = round(df_result["GA"].mean(), 3)
-average_FGA = round(df_result["FGA"].mean(), 3)
-average_PTA = round(df_result["PTA"].mean(), 3)
-average_RTA = round(df_result["RTA"].mean(), 3)
-average_FTA = round(df_result["FTA"].mean(), 3)
-average_parsing_time = round(df_result["P_Time"].mean(), 3)
+    print("=== Overall evaluation results ===")
+    df_result = pd.DataFrame(benchmark_result, columns=["Dataset", "GA", "FGA", "FTA", "PTA", "RTA", "P_Time",
+                                                        "Compressions", "Pruned_GA", "Pruned_P_Time",
+                                                        "Pruned_Compressions", "Avoided"])
+    df_result.set_index("Dataset", inplace=True)
 
-df_result.loc["Average"] = [average_GA, average_FGA, average_FTA, average_PTA,
-                            average_RTA, average_parsing_time]
-print(df_result)
+    average_GA = round(df_result["GA"].mean(), 3)
+    average_FGA = round(df_result["FGA"].mean(), 3)
+    average_PTA = round(df_result["PTA"].mean(), 3)
+    average_RTA = round(df_result["RTA"].mean(), 3)
+    average_FTA = round(df_result["FTA"].mean(), 3)
+    average_parsing_time = round(df_result["P_Time"].mean(), 3)
+    average_compressions = round(df_result["Compressions"].mean(), 1)
+    average_pruned_GA = round(df_result["Pruned_GA"].mean(), 3)
+    average_pruned_time = round(df_result["Pruned_P_Time"].mean(), 3)
+    average_pruned_compressions = round(df_result["Pruned_Compressions"].mean(), 1)
+    average_avoided = round(df_result["Avoided"].mean(), 1)
 
-output_csv_file = os.path.join(output_dir, "LogGzip_results.csv")
-df_result.to_csv(output_csv_file)
-print(f"Results have been saved to {output_csv_file}")
+    df_result.loc["Average"] = [average_GA, average_FGA, average_FTA, average_PTA,
+                                average_RTA, average_parsing_time, average_compressions, average_pruned_GA,
+                                average_pruned_time, average_pruned_compressions, average_avoided]
+    print(df_result)
+
+    output_csv_file = os.path.join(output_dir, "LogGzip_results.csv")
+    df_result.to_csv(output_csv_file)
+    print(f"Results have been saved to {output_csv_file}")
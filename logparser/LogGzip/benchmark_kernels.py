@@ -0,0 +1,64 @@
+#benchmark_kernels.py：
+# Micro-benchmark of the position-match kernel used for every candidate of
+# every line, against the sklearn accuracy_score and the Python loop it
+# replaces.
+import sys
+sys.path.append("../../")
+from logparser.LogGzip.src.LogGzip_template import count_same_positions
+from sklearn.metrics import accuracy_score
+from collections import defaultdict
+import pandas as pd
+import timeit
+
+log_file = "../../data/loghub_24/HDFS/HDFS_2k.log"  # Lines to compare
+number = 200  # Number of passes over the pairs
+
+
+def accuracy_score_before(words, new_words):
+    fill_wildcard = [words[idx] if words[idx] != '' else new_words[idx] for idx in range(len(words))]
+    return accuracy_score(fill_wildcard, new_words)
+
+
+def accuracy_score_after(words, new_words):
+    return count_same_positions(words, new_words, wildcard='') / len(words)
+
+
+def count_before(words, new_words):
+    c = 0
+    for idx in range(len(words)):
+        if words[idx] == new_words[idx]:
+            c = c + 1
+    return c
+
+
+def count_after(words, new_words):
+    return count_same_positions(words, new_words)
+
+
+def load_pairs(log_file):
+    """Pairs of consecutive lines of the same length, as compared when matching."""
+    by_length = defaultdict(list)
+    with open(log_file, "r") as fin:
+        for line in fin:
+            words = line.split()
+            by_length[len(words)].append(words)
+    return [(a, b) for lines in by_length.values() for a, b in zip(lines, lines[1:])]
+
+
+if __name__ == "__main__":
+    pairs = load_pairs(log_file)
+    kernels = [
+        ("accuracy_score", accuracy_score_before, accuracy_score_after, number // 20),
+        ("count_same_word_positions", count_before, count_after, number),
+    ]
+    benchmark_result = []
+    for name, before, after, n in kernels:
+        assert all(before(a, b) == after(a, b) for a, b in pairs)
+        calls = n * len(pairs)
+        before_us = timeit.timeit(lambda: [before(a, b) for a, b in pairs], number=n) / calls * 1e6
+        after_us = timeit.timeit(lambda: [after(a, b) for a, b in pairs], number=n) / calls * 1e6
+        benchmark_result.append([name, round(before_us, 3), round(after_us, 3), round(before_us / after_us, 1)])
+
+    df_result = pd.DataFrame(benchmark_result, columns=["Kernel", "Before_us", "After_us", "Speedup"])
+    print("=== Per-call cost on %d line pairs ===" % len(pairs))
+    print(df_result.to_string(index=False))
@@ -0,0 +1,51 @@
+#benchmark_ncd.py：
+# Compares the incremental NCD path (snapshotted zlib compressobj) with the
+# full recompression path on the loghub_24 datasets.
+import sys
+sys.path.append("../../")
+from logparser.LogGzip import LogParser
+from logparser.LogGzip.compressors import DefaultCompressor
+from benchmark import benchmark_settings, input_dir
+import os
+import pandas as pd
+import time
+
+output_dir = "LogGzip_ncd_result/"  # The output directory of parsing results
+backends = ["gzip", "zlib"]
+
+
+def run(setting, indir, log_file, backend, snapshot):
+    parser = LogParser(
+        log_format=setting["log_format"],
+        indir=indir,
+        outdir=os.path.join(output_dir, "snapshot" if snapshot else "full"),
+        rex=setting["regex"],
+        threshold=setting["threshold"],
+        mask_digits=setting.get("mask_digits", False),
+        compressor_instance=DefaultCompressor(backend, snapshot=snapshot),
+        delimiters=setting.get("delimiters", [r'\s+']),
+    )
+    start_time = time.time()
+    parser.parse(log_file)
+    return round(time.time() - start_time, 3), parser.df_log["EventId"].tolist()
+
+
+if __name__ == "__main__":
+    benchmark_result = []
+    for backend in backends:
+        for dataset, setting in benchmark_settings.items():
+            print("\n=== %s on %s ===" % (backend, dataset))
+            indir = os.path.join(input_dir, os.path.dirname(setting["log_file"]))
+            log_file = os.path.basename(setting["log_file"])
+            full_time, full_ids = run(setting, indir, log_file, backend, snapshot=False)
+            snapshot_time, snapshot_ids = run(setting, indir, log_file, backend, snapshot=True)
+            benchmark_result.append([backend, dataset, full_time, snapshot_time,
+                                     round(full_time / snapshot_time, 2), full_ids == snapshot_ids])
+
+    df_result = pd.DataFrame(benchmark_result,
+                             columns=["Compressor", "Dataset", "Full_Time", "Snapshot_Time", "Speedup", "Identical"])
+    print("=== Incremental NCD results ===")
+    print(df_result.to_string(index=False))
+    output_csv_file = os.path.join(output_dir, "LogGzip_ncd_results.csv")
+    df_result.to_csv(output_csv_file, index=False)
+    print(f"Results have been saved to {output_csv_file}")
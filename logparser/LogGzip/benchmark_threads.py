@@ -0,0 +1,57 @@
+#benchmark_threads.py：
+# Finds, for each DefaultCompressor backend, the number of surviving
+# candidates from which scoring them in a thread pool beats the serial loop.
+import sys
+sys.path.append("../../")
+from logparser.LogGzip.src.LogGzip_template import LenmaTemplateManager, bucket_key
+from logparser.LogGzip.compressors import DefaultCompressor
+import pandas as pd
+import random
+import string
+import timeit
+
+backends = ["gzip", "zlib", "bz2", "lzma", "zstd"]
+candidate_counts = [1, 2, 4, 8, 16, 32, 64, 128]
+scoring_threads = 4
+nwords = 20  # Words per line, a long-ish log message
+number = 20  # Repetitions of each measurement
+
+
+def random_words(rng, first_word):
+    return [first_word] + ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10)))
+                           for _ in range(nwords - 1)]
+
+
+def time_scoring(backend, ncandidates, threads):
+    rng = random.Random(0)
+    # no compressed-length cache, every scoring call really compresses
+    compressor = DefaultCompressor(backend, cache_size=0)
+    templ_mgr = LenmaTemplateManager(threshold=1.1, compressor_instance=compressor, scoring_threads=threads,
+                                     min_parallel_candidates=1)
+    for logid in range(ncandidates):
+        templ_mgr.infer_template(random_words(rng, "INFO"), logid)
+    words = random_words(rng, "INFO")
+    bucket = templ_mgr._buckets[bucket_key(words)]
+    seconds = timeit.timeit(lambda: templ_mgr.get_similarity_scores(words, bucket), number=number) / number
+    templ_mgr.close()
+    return seconds * 1e6
+
+
+if __name__ == "__main__":
+    benchmark_result = []
+    for backend in backends:
+        crossover = None
+        for ncandidates in candidate_counts:
+            serial_us = time_scoring(backend, ncandidates, 0)
+            threaded_us = time_scoring(backend, ncandidates, scoring_threads)
+            # the crossover is where the pool stays faster for larger buckets
+            if threaded_us >= serial_us:
+                crossover = None
+            elif crossover is None:
+                crossover = ncandidates
+            benchmark_result.append([backend, ncandidates, round(serial_us, 1), round(threaded_us, 1)])
+        print("%s: thread pool faster from %s candidates" % (backend, crossover))
+
+    df_result = pd.DataFrame(benchmark_result, columns=["Compressor", "Candidates", "Serial_us", "Threaded_us"])
+    print("=== Scoring time per line with %d threads ===" % scoring_threads)
+    print(df_result.to_string(index=False))
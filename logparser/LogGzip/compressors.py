@@ -1,34 +1,397 @@
 # compressors.py
 
+import bz2
+import lzma
+import sys
+import threading
+import zlib
+from collections import OrderedDict, namedtuple
 from importlib import import_module
 
 import numpy as np
 
 
-class DefaultCompressor:
-    """For non-neural-based compressor"""
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize", "nbytes"])
+
+BACKENDS = {}
+
+
+def register_backend(name):
+    """Registers a CompressorBackend subclass under `name`."""
+    def decorator(cls):
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+class CompressorBackend:
+    """A named compression backend with a configurable level.
+
+    Backends that can reuse a compression context create it once in
+    `_init_context`; contexts are not pickled but rebuilt in worker
+    processes.
+    """
+
+    default_level = None
+    supports_snapshot = False
+
+    def __init__(self, level=None):
+        self.level = self.default_level if level is None else level
+        self._init_context()
+
+    def _init_context(self):
+        pass
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_context", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_context()
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def compressed_len(self, data: bytes) -> int:
+        return len(self.compress(data))
+
+
+class ModuleBackend(CompressorBackend):
+    """Any importable module with a `compress(bytes)` function."""
+
+    def __init__(self, name, level=None):
+        try:
+            self.module = import_module(name)
+        except ModuleNotFoundError:
+            raise RuntimeError("Unsupported compressor")
+        self.name = name
+        super().__init__(level)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["module"] = self.name
+        return state
+
+    def __setstate__(self, state):
+        state["module"] = import_module(state["module"])
+        super().__setstate__(state)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.level is None:
+            return self.module.compress(data)
+        return self.module.compress(data, self.level)
+
+
+@register_backend("zlib")
+class ZlibBackend(CompressorBackend):
+    """zlib streams; `wbits` selects the container (15: zlib, 31: gzip,
+    -15: raw deflate without header and checksum) and `strategy` the
+    deflate strategy.
+    """
+
+    default_level = zlib.Z_DEFAULT_COMPRESSION
+    default_wbits = zlib.MAX_WBITS
+    supports_snapshot = True
+
+    def __init__(self, level=None, wbits=None, strategy=zlib.Z_DEFAULT_STRATEGY, memlevel=zlib.DEF_MEM_LEVEL):
+        self.wbits = self.default_wbits if wbits is None else wbits
+        self.strategy = strategy
+        self.memlevel = memlevel
+        super().__init__(level)
+
+    def _compressobj(self):
+        return zlib.compressobj(self.level, zlib.DEFLATED, self.wbits, self.memlevel, self.strategy)
+
+    def compress(self, data: bytes) -> bytes:
+        # a fresh compressobj is cheaper than copying a primed one
+        compressobj = self._compressobj()
+        return compressobj.compress(data) + compressobj.flush()
+
+    def compressed_len(self, data: bytes) -> int:
+        compressobj = self._compressobj()
+        return len(compressobj.compress(data)) + len(compressobj.flush())
+
+    def snapshot(self, prefix: bytes):
+        compressobj = self._compressobj()
+        return compressobj, len(compressobj.compress(prefix))
+
+    def compressed_len_from(self, snapshot, suffix: bytes) -> int:
+        compressobj, emitted = snapshot
+        compressobj = compressobj.copy()
+        return emitted + len(compressobj.compress(suffix)) + len(compressobj.flush())
+
+
+@register_backend("gzip")
+class GzipBackend(ZlibBackend):
+    """Same output length as `gzip.compress`."""
+
+    default_level = 9
+    default_wbits = 16 + zlib.MAX_WBITS
+
+
+@register_backend("deflate")
+class DeflateBackend(ZlibBackend):
+    """Raw deflate, skipping the header and checksum overhead."""
+
+    default_wbits = -zlib.MAX_WBITS
+
+
+@register_backend("bz2")
+class Bz2Backend(CompressorBackend):
+    default_level = 9
+
+    def compress(self, data: bytes) -> bytes:
+        return bz2.compress(data, self.level)
+
+
+@register_backend("lzma")
+class LzmaBackend(CompressorBackend):
+    """`level` is the lzma preset; FORMAT_RAW or FORMAT_ALONE save the xz
+    container overhead.
+    """
+
+    def __init__(self, level=None, format=None):
+        self.format = lzma.FORMAT_XZ if format is None else format
+        super().__init__(level)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.format == lzma.FORMAT_RAW:
+            filters = [{"id": lzma.FILTER_LZMA2, "preset": lzma.PRESET_DEFAULT if self.level is None else self.level}]
+            return lzma.compress(data, format=self.format, filters=filters)
+        return lzma.compress(data, format=self.format, preset=self.level)
+
+
+@register_backend("zstd")
+class ZstdBackend(CompressorBackend):
+    """zstandard with a reused ZstdCompressor context per thread, since a
+    ZstdCompressor cannot be used by several threads at once (see
+    `scoring_threads` of LenmaTemplateManager).
+    """
+
+    default_level = 3
+
+    def _init_context(self):
+        try:
+            import zstandard
+        except ModuleNotFoundError:
+            raise RuntimeError("Unsupported compressor")
+        self._zstd_compressor = zstandard.ZstdCompressor
+        self._context = threading.local()
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop("_zstd_compressor", None)
+        return state
+
+    def compress(self, data: bytes) -> bytes:
+        context = self._context
+        try:
+            compressor = context.compressor
+        except AttributeError:
+            compressor = context.compressor = self._zstd_compressor(level=self.level)
+        return compressor.compress(data)
 
-    def __init__(self, compressor, typ="text"):
+
+@register_backend("lz4")
+class Lz4Backend(CompressorBackend):
+    default_level = 0
+
+    def _init_context(self):
+        try:
+            import lz4.frame
+        except ModuleNotFoundError:
+            raise RuntimeError("Unsupported compressor")
+        self._context = lz4.frame.compress
+
+    def compress(self, data: bytes) -> bytes:
+        return self._context(data, compression_level=self.level)
+
+
+@register_backend("brotli")
+class BrotliBackend(CompressorBackend):
+    default_level = 11
+
+    def _init_context(self):
         try:
-            self.compressor = import_module(compressor)
+            import brotli
         except ModuleNotFoundError:
             raise RuntimeError("Unsupported compressor")
+        self._context = brotli.compress
+
+    def compress(self, data: bytes) -> bytes:
+        return self._context(data, quality=self.level)
+
+
+def get_backend(name, level=None, **options):
+    """
+    Creates a compression backend.
+
+    Arguments:
+        name (str): A registered backend name (see BACKENDS), or the name of
+                    any module with a `compress(bytes)` function.
+        level (int): Compression level, the backend default if None.
+        options: Backend specific options, e.g. `wbits` or `strategy` for
+                 the zlib family.
+
+    Returns:
+        CompressorBackend: The backend.
+    """
+    if name in BACKENDS:
+        return BACKENDS[name](level=level, **options)
+    return ModuleBackend(name, level=level, **options)
+
+
+class DefaultCompressor:
+    """For non-neural-based compressor
+
+    `compressor` names a registered backend (zlib, gzip, deflate, bz2, lzma,
+    zstd, lz4, brotli) or any module with a `compress` function; `level` and
+    backend `options` tune it.
+    """
+
+    def __init__(self, compressor, typ="text", cache_size=65536, cache_bytes=None, snapshot=False, level=None,
+                 **options):
+        self.compressor = get_backend(compressor, level=level, **options)
+        self.name = compressor
         self.type = typ
 
-    def get_compressed_len(self, x: str) -> int:
+        # zlib-family backends can snapshot a compressor that has already
+        # consumed a prefix, so C(prefix + suffix) never recompresses prefix.
+        # Copying a deflate state costs about as much as compressing a short
+        # log line, so this only pays off for long templates and is opt-in.
+        self._snapshot = snapshot and typ == "text" and self.compressor.supports_snapshot
+
+        # LRU cache of compressed lengths keyed on the exact input.
+        # ``cache_size`` bounds the number of entries (0 disables the cache)
+        # and ``cache_bytes`` optionally bounds the memory held by the keys.
+        self.cache_size = cache_size
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()
+        self._cache_nbytes = 0
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # worker processes start with an empty cache, the backend rebuilds
+        # its compression context
+        state = self.__dict__.copy()
+        state["_cache"] = OrderedDict()
+        state["_cache_nbytes"] = 0
+        state["hits"] = state["misses"] = 0
+        del state["_cache_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache_lock = threading.Lock()
+
+    def _compress_len(self, x) -> int:
+        if self.type == "text":
+            return self.compressor.compressed_len(x.encode("utf-8"))
+        else:
+            return self.compressor.compressed_len(np.array(x).tobytes())
+
+    def get_compressed_len(self, x: str, cache: bool = True) -> int:
         """
         Calculates the size of `x` once compressed.
 
+        Results are memoized in a bounded LRU cache, so repeated inputs
+        (template texts, duplicated log bodies) are only compressed once.
+        Inputs that are seldom seen twice, such as the concatenation of a
+        template and a line, should pass cache=False so that they do not
+        evict the reused lengths.
+
         Arguments:
             x (str): String to be compressed.
+            cache (bool): Whether to look up and store x in the cache.
 
         Returns:
             int: Length of x after compression.
         """
-        if self.type == "text":
-            return len(self.compressor.compress(x.encode("utf-8")))
-        else:
-            return len(self.compressor.compress(np.array(x).tobytes()))
+        if not (cache and self.cache_size):
+            return self._compress_len(x)
+
+        # the backends release the GIL while compressing, so the cache may be
+        # shared by scoring threads; only the bookkeeping holds the lock
+        try:
+            hash(x)
+        except TypeError:
+            # unhashable input, e.g. a list for non-text compressors
+            return self._compress_len(x)
+
+        cache = self._cache
+        with self._cache_lock:
+            if x in cache:
+                cache.move_to_end(x)
+                self.hits += 1
+                return cache[x]
+
+        length = self._compress_len(x)
+        with self._cache_lock:
+            self.misses += 1
+            if x not in cache:
+                cache[x] = length
+                self._cache_nbytes += sys.getsizeof(x)
+            while len(cache) > self.cache_size or (
+                self.cache_bytes is not None and self._cache_nbytes > self.cache_bytes and len(cache) > 1
+            ):
+                key, _ = cache.popitem(last=False)
+                self._cache_nbytes -= sys.getsizeof(key)
+        return length
+
+    @property
+    def supports_snapshot(self) -> bool:
+        """Whether the backend can resume compression from a snapshot."""
+        return self._snapshot
+
+    def snapshot(self, prefix: str):
+        """
+        Returns a compressor state that has already consumed `prefix`.
+
+        Arguments:
+            prefix (str): Text to be fed to the compressor.
+
+        Returns:
+            tuple: (compressobj, number of bytes already emitted), or None if
+                   the backend cannot snapshot.
+        """
+        if not self._snapshot:
+            return None
+        return self.compressor.snapshot(prefix.encode("utf-8"))
+
+    def get_compressed_len_from(self, snapshot, suffix: str) -> int:
+        """
+        Calculates the compressed size of the snapshot prefix followed by
+        `suffix`, without recompressing the prefix.
+
+        Arguments:
+            snapshot (tuple): State returned by `snapshot`.
+            suffix (str): String appended to the snapshot prefix.
+
+        Returns:
+            int: Length of prefix + suffix after compression.
+        """
+        return self.compressor.compressed_len_from(snapshot, suffix.encode("utf-8"))
+
+    def cache_info(self) -> CacheInfo:
+        """
+        Returns the statistics of the compressed-length cache.
+
+        Returns:
+            CacheInfo: (hits, misses, maxsize, currsize, nbytes)
+        """
+        return CacheInfo(self.hits, self.misses, self.cache_size, len(self._cache), self._cache_nbytes)
+
+    def cache_clear(self):
+        """Clears the compressed-length cache and its statistics."""
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_nbytes = 0
+            self.hits = 0
+            self.misses = 0
 
     def get_bits_per_character(self, original_fn: str) -> float:
         """
@@ -51,3 +414,5 @@ class DefaultCompressor:
 if __name__ == "__main__":
     comp = DefaultCompressor("gzip")
     print(comp.get_compressed_len("测试 DefaultCompressor 类是否正确工作"))
+    print(comp.get_compressed_len("测试 DefaultCompressor 类是否正确工作"))
+    print(comp.cache_info())
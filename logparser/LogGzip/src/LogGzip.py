@@ -1,12 +1,24 @@
 #LogGzip.py
-from logparser.LogGzip.src.LogGzip_template import LenmaTemplateManager
+from logparser.LogGzip.src.LogGzip_template import LenmaTemplateManager, shard_key
+from logparser.LogGzip.src.preprocessor import Preprocessor
+from logparser.LogGzip.src.tokenizer import Tokenizer
+from logparser.LogGzip.src.sinks import get_sink
+import numpy as np
 import pandas as pd
 import regex as re
 import os
+import glob
 import hashlib
-from collections import defaultdict
+import heapq
+import pickle
+import time
+from collections import Counter, defaultdict, deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from logparser.LogGzip.compressors import DefaultCompressor
+from logparser.utils.linereader import TailReader
+from logparser.utils.logloader import LogLoader
 
 
 
@@ -22,6 +34,16 @@ class LogParser(object):
         rex=[],
         mask_digits=False,
         delimiters=None,
+        scoring_threads=0,
+        min_parallel_candidates=16,
+        prune=False,
+        dedup_size=None,
+        dedup_bytes=None,
+        preprocess_timing=False,
+        content_memo_size=100000,
+        output_format="csv",
+        output_options=None,
+        background_decompression=False,
     ):
         self.path = indir
         self.savePath = outdir
@@ -33,155 +55,557 @@ class LogParser(object):
         self.mask_digits = mask_digits
         self.logname = None
         self.compressor = compressor_instance
+        self.threshold = threshold
         self.delimiters = delimiters or [r'\s+']
+        self.tokenizer = Tokenizer(self.delimiters)
         self.template_dict = {}
+        self.preprocess_timing = preprocess_timing
+        self.preprocessor = None
+        # "csv", "parquet", "feather" or an OutputSink, see sinks.py
+        self.sink = get_sink(output_format, **(output_options or {}))
+        # compressed input is decompressed in a thread ahead of the parsing
+        self.background_decompression = background_decompression
+
+        # LRU memo from raw Content to (template, words): byte-identical
+        # message bodies skip masking, tokenizing and hashing.
+        self.content_memo_size = content_memo_size
+        self.content_memo = OrderedDict()
+        self.memo_hits = 0
+        self.memo_misses = 0
+        # cache and dedup counts of the template managers of parse_parallel
+        self.worker_stats = Counter()
         print(f"Received compressor_instance: {compressor_instance}")
         assert compressor_instance is not None, "Compressor instance is None inside LogParser __init__"
 
+        # both are heuristics that can change the result, see LenmaTemplateManager
+        self.prune = prune
+        self.dedup_size = dedup_size
+        self.dedup_bytes = dedup_bytes
         self.templ_mgr = LenmaTemplateManager(
             threshold=threshold,
             predefined_templates=predefined_templates,
             compressor_instance=self.compressor,
+            scoring_threads=scoring_threads,
+            min_parallel_candidates=min_parallel_candidates,
+            prune=prune,
+            dedup_size=dedup_size,
+            dedup_bytes=dedup_bytes,
         )
 
-    def parse(self, logname):
+    def parse(self, logname, workers=1, stream=False):
+        """Parses a log file.
+
+        Lines are read, split into headers, preprocessed, tokenized and
+        matched one at a time; the structured table is only built at the end.
+        With stream=True it is never built: each line is written out with its
+        template as of the time it was matched (later lines may still
+        generalize that template), so memory is bounded by the template
+        state rather than by the input size. Lines are then matched in this
+        process, stream=True cannot be combined with workers > 1.
+        """
+        if stream and workers > 1:
+            raise ValueError("stream=True matches the lines serially, got workers={}".format(workers))
         print("Parsing file: " + os.path.join(self.path, logname))
         self.logname = logname
         starttime = datetime.now()
-        headers, regex = self.generate_logformat_regex(self.logformat)
-        self.df_log = self.log_to_dataframe(
-            os.path.join(self.path, self.logname), regex, headers, self.logformat
+        loader = LogLoader(self.logformat, non_ascii=None)
+        headers = loader.headers
+        messages = loader.iter_messages(os.path.join(self.path, self.logname),
+                                        background=self.background_decompression)
+        self.preprocessor = Preprocessor.for_parser(
+            self.rex, self.mask_digits, is_apache="Apache" in logname,
+            timing=self.preprocess_timing,
         )
-        is_apache = "Apache" in logname
-        digit_rex = re.compile(r'(?<!\d)\d{2,}(?!\d)|(?<!\d)\d(?!\d)')
-        for idx, line in self.df_log.iterrows():
-            line = line["Content"]
-            line = self.preprocess(line)
-            if self.mask_digits:
-                line = re.sub(r'(\S+):(\S+)', '<*>:<*>', line)
-                line = re.sub(r'\b\d+\b', '<*>', line)
-                line = re.sub(r'\(<\*> <\*>\)', '', line)
+        try:
+            if stream:
+                self.parse_stream(messages, headers)
             else:
-                line = re.sub(r'(\b\d+:\d+\b)', '<*>', line)
-                if not is_apache:
-                    line = digit_rex.sub('<*>', line)
-                line = re.sub(r'(?<=\s|\])([^\s]*\*){3,}[^\s*]*(?=\s\]|\s[^]]|$)', '<*>', line)
+                if workers > 1:
+                    rows = self.parse_parallel(messages, headers, workers)
+                else:
+                    rows = []
+                    content = headers.index("Content")
+                    for idx, message in enumerate(messages):
+                        rows.append(message)
+                        self.match_content(message[content], idx)
+                self.df_log = self.messages_to_dataframe(rows, headers)
+                self.dump_results()
+        finally:
+            self.templ_mgr.close()
+
+        # the content memo is not used when matching in a process pool
+        self.print_stats(memo=workers <= 1)
+        if self.preprocess_timing:
+            self.preprocessor.print_timings()
+        print("Parsing done. [Time taken: {!s}]".format(datetime.now() - starttime))
 
-            words = self.tokenize(line, delimiters=self.delimiters)
-            self.templ_mgr.infer_template(words, idx, self.mask_digits)
+    def parse_many(self, lognames, workers=1):
+        """Parses many log files, e.g. rotated ones, against one template state.
 
-        self.dump_results()
+        lognames is a list of file names, a glob pattern ("**" matches any
+        number of directories, including none) or a directory, whose files are
+        all parsed, relative to the input directory. Loading, header
+        splitting, preprocessing and tokenizing run file by file in a process
+        pool of `workers`, a few files ahead of the matching. Every line is
+        matched in this process against the templates of all files so far, so
+        a template keeps its EventId from one file to the next. Each file gets
+        its own structured and templates tables, with the templates as of the
+        end of that file: a template that later files generalize gets a new
+        EventId from then on.
+        """
+        if isinstance(lognames, str):
+            paths = find_logs(os.path.join(self.path, lognames))
+        else:
+            paths = [os.path.join(self.path, logname) for logname in lognames]
+        print("Parsing {} files".format(len(paths)))
+        starttime = datetime.now()
+        headers = LogLoader(self.logformat).headers
+        content = headers.index("Content")
+        tasks = [(path, self.logformat,
+                  dict(rex=self.rex, mask_digits=self.mask_digits,
+                       is_apache="Apache" in os.path.relpath(path, self.path)),
+                  self.delimiters, self.background_decompression) for path in paths]
+        try:
+            for path, (rows, lines_words) in zip(paths, prepare_files(tasks, workers)):
+                print("Matching file: " + path)
+                self.logname = os.path.relpath(path, self.path)
+                for idx, (message, words) in enumerate(zip(rows, lines_words)):
+                    self.match_content(message[content], idx, words)
+                self.df_log = self.messages_to_dataframe(rows, headers)
+                os.makedirs(os.path.dirname(self.output_path("structured")), exist_ok=True)
+                self.dump_results()
+                # the next file numbers its lines from 0 again
+                self.templ_mgr.clear_logids()
+        finally:
+            self.templ_mgr.close()
+        self.print_stats()
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - starttime))
 
+    def print_stats(self, memo=True):
+        # the entries of the worker processes are added up
+        workers = self.worker_stats
+        if hasattr(self.compressor, "cache_info"):
+            info = self.compressor.cache_info()
+            print("Compressed-length cache: {} hits, {} misses, {} entries".format(
+                info.hits + workers["cache_hits"], info.misses + workers["cache_misses"],
+                info.currsize + workers["cache_entries"]))
+        entries, _, hits, misses = self.templ_mgr.dedup_info()
+        entries += workers["dedup_entries"]
+        print("Dedup table: {} entries, {} hits, {} misses ({:.1%} hit rate)".format(
+            entries, hits, misses, hits / (hits + misses) if hits + misses else 0))
+        if self.templ_mgr.prune:
+            print("Concatenation compressions: {} evaluated, {} avoided by the similarity bound".format(
+                self.templ_mgr.stats["compressions"], self.templ_mgr.stats["compressions_avoided"]))
+        else:
+            print("Concatenation compressions: {} evaluated".format(self.templ_mgr.stats["compressions"]))
+        if self.content_memo_size and memo:
+            lookups = self.memo_hits + self.memo_misses
+            print("Content memo: {} hits, {} misses ({:.1%} hit rate), {} entries".format(
+                self.memo_hits, self.memo_misses, self.memo_hits / lookups if lookups else 0,
+                len(self.content_memo)))
+
+    def parse_stream(self, messages, headers):
+        """Matches the lines and writes the structured rows one row group at a time."""
+        if not os.path.isdir(self.savePath):
+            os.makedirs(self.savePath)
+
+        events = {}  # normalized template -> event index, in order of first appearance
+        event_ids = []
+        content = headers.index("Content")
+        rows, line_events = [], []
+        lineid = 1
+        with self.sink.open(self.output_path("structured")) as writer:
+            for message in messages:
+                # logids are not kept, the rows are already written
+                t = self.match_content(message[content], None)
+                template = normalize_template(t.text)
+                k = events.setdefault(template, len(events))
+                if k == len(event_ids):
+                    event_ids.append(event_id(template))
+                rows.append(message)
+                line_events.append(k)
+                if len(rows) == self.sink.row_group_size:
+                    # the categories only grow, as dictionary deltas need
+                    writer.write(structured_frame(rows, headers, lineid, line_events, list(events), event_ids))
+                    lineid += len(rows)
+                    rows, line_events = [], []
+            if rows or lineid == 1:
+                writer.write(structured_frame(rows, headers, lineid, line_events, list(events), event_ids))
+        self.dump_template_counts()
+
+    def dump_template_counts(self):
+        """Writes the templates table from the line counts of the templates,
+        for the modes that do not keep the logids.
+        """
+        template_events, event_templates, event_ids = self.group_templates()
+        occurrences = np.zeros(len(event_templates), dtype=np.int64)
+        np.add.at(occurrences, template_events, [t.counts for t in self.templ_mgr.templates])
+        event_dict = {
+            template: {"EventId": eventid, "Occurrences": int(count)}
+            for template, eventid, count in zip(event_templates, event_ids, occurrences)
+        }
+        self.dump_templates(event_dict)
+
+    def follow(self, logname, checkpoint_interval=60, checkpoint_lines=1000000, poll_interval=1.0,
+               idle_timeout=None, checkpoint_path=None):
+        """Tails a growing log file and parses the lines appended to it.
+
+        The file is followed across rotation and truncation (see TailReader)
+        until no line arrives for idle_timeout seconds, forever if None, or
+        until interrupted. Lines are matched as they arrive, as with
+        stream=True. Every checkpoint_interval seconds, or checkpoint_lines
+        lines, the lines parsed since the last checkpoint are written as one
+        part of the structured table (e.g. HDFS.log_structured_000003.csv),
+        the templates table is rewritten with the counts so far, and the
+        byte offset is saved with the template manager in checkpoint_path,
+        by default <outdir>/<logname>.checkpoint. Following the file again
+        resumes from the checkpoint: lines already parsed are not parsed
+        again and the templates, counts and LineIds carry on. The saved
+        offset is the one after the last line matched, so when interrupted
+        in the middle of a chunk the rest of the chunk is read again.
+        """
+        path = os.path.join(self.path, logname)
+        self.logname = logname
+        if checkpoint_path is None:
+            checkpoint_path = os.path.join(self.savePath, logname + ".checkpoint")
+        os.makedirs(os.path.dirname(self.output_path("structured")), exist_ok=True)
+        state = {"offset": 0, "inode": None, "lineid": 1, "part": 1}
+        if os.path.exists(checkpoint_path):
+            state = self.load_checkpoint(checkpoint_path)
+            print("Resuming {} at byte {}, line {}".format(path, state["offset"], state["lineid"]))
+        print("Following file: " + path)
+
+        loader = LogLoader(self.logformat, non_ascii=None)
+        headers = loader.headers
+        content = headers.index("Content")
+        self.preprocessor = Preprocessor.for_parser(
+            self.rex, self.mask_digits, is_apache="Apache" in logname,
+            timing=self.preprocess_timing,
+        )
+        reader = TailReader(path, state["offset"], state["inode"])
+        # (offset, inode) after the last line matched
+        position = (reader.offset, reader.inode)
+        rows, templates = [], []
+        skipped, example = 0, None
+        last_checkpoint = last_line = time.time()
+        try:
+            while True:
+                lines = reader.read()
+                for line, end in zip(lines, reader.ends):
+                    messages, (line_skipped, line_example) = loader.extract_lines([line])
+                    skipped += line_skipped
+                    example = example or line_example
+                    for message in messages:
+                        # logids are not kept, the rows are written at each checkpoint
+                        t = self.match_content(message[content], None)
+                        rows.append(message)
+                        templates.append(normalize_template(t.text))
+                    position = (end, reader.ends_inode)
+                if lines:
+                    last_line = time.time()
+                now = time.time()
+                if len(rows) >= checkpoint_lines or now - last_checkpoint >= checkpoint_interval:
+                    if rows or position != (state["offset"], state["inode"]):
+                        loader.report_skipped(skipped, example)
+                        skipped, example = 0, None
+                        self.checkpoint(checkpoint_path, state, position, rows, templates, headers)
+                        rows, templates = [], []
+                    last_checkpoint = now
+                if not lines:
+                    if idle_timeout is not None and now - last_line >= idle_timeout:
+                        break
+                    time.sleep(poll_interval)
+        finally:
+            # also when interrupted, the lines matched so far are not lost
+            loader.report_skipped(skipped, example)
+            self.checkpoint(checkpoint_path, state, position, rows, templates, headers)
+            reader.close()
+            self.templ_mgr.close()
+        self.print_stats()
+        print("Stopped following {} at byte {}, line {}".format(path, state["offset"], state["lineid"]))
+
+    def checkpoint(self, checkpoint_path, state, position, rows, templates, headers):
+        """Writes the rows as the next part of the structured table and the
+        templates table, then saves the (offset, inode) position after the
+        rows and the template manager. A part written before a crash is
+        written again on resuming.
+        """
+        if rows:
+            codes, event_templates = pd.factorize(np.array(templates, dtype=object))
+            event_ids = [event_id(template) for template in event_templates]
+            self.sink.write(structured_frame(rows, headers, state["lineid"], codes, list(event_templates), event_ids),
+                            self.output_path("structured_%06d" % state["part"]))
+            state["lineid"] += len(rows)
+            state["part"] += 1
+        self.dump_template_counts()
+        state["offset"], state["inode"] = position
+        tmp_path = checkpoint_path + ".tmp"
+        with open(tmp_path, "wb") as fout:
+            pickle.dump(dict(state, templ_mgr=self.templ_mgr), fout, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, checkpoint_path)
+
+    def load_checkpoint(self, checkpoint_path):
+        """Restores the template manager of a checkpoint and returns the
+        reader position, next LineId and next part number.
+        """
+        with open(checkpoint_path, "rb") as fin:
+            state = pickle.load(fin)
+        self.templ_mgr = state.pop("templ_mgr")
+        self.templ_mgr.compressor_instance = self.compressor
+        for template in self.templ_mgr.templates:
+            template.compressor = self.compressor
+        # memoized templates belong to the previous manager
+        self.content_memo.clear()
+        return state
+
+    def parse_parallel(self, messages, headers, workers):
+        """Matches the lines in a process pool and returns the messages.
+
+        A template only absorbs lines with the same shard key (word count and
+        first word), so lines are tokenized once, routed to shards by that key,
+        and each group of shards is matched by its own template manager. The
+        result is the same as matching the lines serially, unless the dedup
+        table is bounded: each manager then evicts other lines.
+        """
+        rows = list(messages)
+        content = headers.index("Content")
+        lines = [self.preprocessor(message[content]) for message in rows]
+        shards = defaultdict(list)
+        for idx, words in enumerate(self.tokenizer.batch(lines)):
+            shards[shard_key(words, self.mask_digits)].append((idx, words))
+
+        # balance the shards over a few tasks per worker, largest first
+        ntasks = min(len(shards), workers * 4)
+        tasks = [(0, k, []) for k in range(ntasks)]
+        for lines in sorted(shards.values(), key=len, reverse=True):
+            nlines, k, task = heapq.heappop(tasks)
+            task.append(lines)
+            heapq.heappush(tasks, (nlines + len(lines), k, task))
+        print("Matching {} shards in {} tasks with {} workers".format(len(shards), ntasks, workers))
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(match_lines, sorted(line for lines in task for line in lines),
+                            self.threshold, self.compressor, self.mask_digits,
+                            prune=self.prune, dedup_size=self.dedup_size, dedup_bytes=self.dedup_bytes)
+                for _, _, task in tasks
+            ]
+            templates = []
+            for future in futures:
+                task_templates, stats, cache_info, dedup_entries = future.result()
+                templates.extend(task_templates)
+                self.templ_mgr.stats.update(stats)
+                if cache_info is not None:
+                    self.worker_stats.update(cache_hits=cache_info.hits, cache_misses=cache_info.misses,
+                                             cache_entries=cache_info.currsize)
+                self.worker_stats["dedup_entries"] += dedup_entries
+        self.templ_mgr.merge_templates(templates)
+        return rows
+
+    def match_content(self, content, logid, words=None):
+        """Matches a raw message body and returns its template. words are its
+        tokens, if they were already computed.
+        """
+        if not self.content_memo_size:
+            if words is None:
+                words = self.get_words(content)
+            return self.templ_mgr.infer_template(words, logid, self.mask_digits)
+
+        memo = self.content_memo
+        entry = memo.get(content)
+        if entry is not None:
+            memo.move_to_end(content)
+            self.memo_hits += 1
+            template, words = entry
+            self.templ_mgr.add_line(template, words, logid)
+            return template
+
+        self.memo_misses += 1
+        if words is None:
+            words = self.get_words(content)
+        template = self.templ_mgr.infer_template(words, logid, self.mask_digits)
+        memo[content] = (template, words)
+        if len(memo) > self.content_memo_size:
+            memo.popitem(last=False)
+        return template
+
+    def get_words(self, line):
+        return self.tokenizer(self.preprocessor(line))
+
     def tokenize(self, line, delimiters):
+        if delimiters != self.tokenizer.delimiters:
+            return Tokenizer(delimiters)(line)
+        return self.tokenizer(line)
 
-        token_delimiters = '|'.join(delimiters)
-        tokens = re.split('(' + token_delimiters + ')', line)
+    def group_templates(self):
+        """Normalizes every template once and groups the equal ones into events.
 
-        tokens = [token for token in tokens if token.strip()]
-        return tokens
+        Returns the event index of each template, the distinct normalized
+        templates in order of first appearance and their EventIds.
+        """
+        events = {}
+        template_events = np.empty(len(self.templ_mgr.templates), dtype=np.int64)
+        for k, t in enumerate(self.templ_mgr.templates):
+            template_events[k] = events.setdefault(normalize_template(t.text), len(events))
+        event_templates = list(events)
+        return template_events, event_templates, [event_id(template) for template in event_templates]
 
     def dump_results(self):
         if not os.path.isdir(self.savePath):
             os.makedirs(self.savePath)
 
-        event_dict = {}
-        templates = [0] * self.df_log.shape[0]
-        template_ids = [0] * self.df_log.shape[0]
-
-        for t in self.templ_mgr.templates:
-            template = " ".join(t.words)
-            template = update_template(template)
-            eventid = hashlib.md5(template.encode("utf-8")).hexdigest()[0:8]
-            logids = t.get_logids()
+        template_events, event_templates, event_ids = self.group_templates()
+        logids = [t.get_logids() for t in self.templ_mgr.templates]
+        sizes = np.fromiter((len(ids) for ids in logids), dtype=np.int64, count=len(logids))
+        # event index of every line
+        line_events = np.zeros(self.df_log.shape[0], dtype=np.int64)
+        if logids:
+            line_events[np.concatenate(logids)] = np.repeat(template_events, sizes)
+        occurrences = np.bincount(template_events, weights=sizes, minlength=len(event_templates)).astype(np.int64)
 
-            if template in event_dict:
-                event_dict[template]["Occurrences"] += len(logids)
-                event_id = event_dict[template]["EventId"]
-            else:
-                event_dict[template] = {"EventId": eventid, "Occurrences": len(logids)}
-                event_id = eventid
+        self.df_log["EventId"], self.df_log["EventTemplate"] = event_columns(line_events, event_templates, event_ids)
 
-            for logid in logids:
-                templates[logid] = template
-                template_ids[logid] = event_id
+        # parse_many keeps the templates of earlier files, without lines here
+        event_dict = {
+            template: {"EventId": eventid, "Occurrences": int(count)}
+            for template, eventid, count in zip(event_templates, event_ids, occurrences) if count
+        }
+        self.dump_templates(event_dict)
+        self.sink.write(self.df_log, self.output_path("structured"))
 
+    def dump_templates(self, event_dict):
         df_event = [
             [info["EventId"], tpl, info["Occurrences"]]
             for tpl, info in event_dict.items()
         ]
-
-        self.df_log["EventId"] = template_ids
-        self.df_log["EventTemplate"] = templates
-
-        pd.DataFrame(
-            df_event, columns=["EventId", "EventTemplate", "Occurrences"]
-        ).to_csv(
-            os.path.join(self.savePath, self.logname + "_templates.csv"), index=False
-        )
-        self.df_log.to_csv(
-            os.path.join(self.savePath, self.logname + "_structured.csv"), index=False
+        self.sink.write(
+            pd.DataFrame(df_event, columns=["EventId", "EventTemplate", "Occurrences"]),
+            self.output_path("templates"),
         )
 
+    def output_path(self, table):
+        """Path of the structured or templates table, e.g. HDFS_2k.log_templates.csv."""
+        return self.sink.path(os.path.join(self.savePath, self.logname + "_" + table))
+
     def preprocess(self, line):
         for currentRex in self.rex:
             line = re.sub(currentRex, "<*>", line)
         return line
 
-    def log_to_dataframe(self, log_file, regex, headers, logformat):
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
+    def messages_to_dataframe(self, log_messages, headers):
         logdf = pd.DataFrame(log_messages, columns=headers)
         logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
+        logdf["LineId"] = [i + 1 for i in range(len(log_messages))]
         return logdf
 
-    def generate_logformat_regex(self, logformat):
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+
+def event_columns(line_events, event_templates, event_ids):
+    """EventId and EventTemplate columns from the event index of each line."""
+    # EventIds can collide on their 8 hex digits, categories must be unique
+    id_codes, id_categories = pd.factorize(np.array(event_ids, dtype=object))
+    return (pd.Categorical.from_codes(id_codes.take(line_events), id_categories),
+            pd.Categorical.from_codes(line_events, event_templates))
+
+
+def structured_frame(rows, headers, first_lineid, line_events, event_templates, event_ids):
+    """One batch of the structured table, numbered from first_lineid."""
+    frame = pd.DataFrame(rows, columns=headers)
+    frame.insert(0, "LineId", np.arange(first_lineid, first_lineid + len(rows), dtype=np.int64))
+    frame["EventId"], frame["EventTemplate"] = event_columns(
+        np.asarray(line_events, dtype=np.int64), event_templates, event_ids)
+    return frame
+
+
+def find_logs(pattern):
+    """Sorted paths of the files matched by a recursive glob pattern, or of
+    all the files under a directory.
+    """
+    if os.path.isdir(pattern):
+        return sorted(os.path.join(root, name) for root, _, names in os.walk(pattern) for name in names)
+    return sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+
+
+def prepare_file(path, logformat, preprocessing, delimiters, background=False):
+    """Loads a log file and tokenizes the preprocessed Content of every line.
+    Returns the header values and the words of each line.
+    """
+    loader = LogLoader(logformat, non_ascii=None)
+    rows = list(loader.iter_messages(path, background=background))
+    content = loader.headers.index("Content")
+    preprocessor = Preprocessor.for_parser(**preprocessing)
+    return rows, Tokenizer(delimiters).batch([preprocessor(message[content]) for message in rows])
+
+
+def _prepare_file(task):
+    return prepare_file(*task)
+
+
+def prepare_files(tasks, workers=1):
+    """Yields prepare_file of each task in order, computed by a process pool
+    with workers > 1. At most 2 * workers files are prepared ahead of the
+    one being consumed, which bounds the memory.
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield _prepare_file(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_prepare_file, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def match_lines(lines, threshold, compressor, mask_digits, prune=False, dedup_size=None, dedup_bytes=None):
+    """Matches (logid, words) lines with a fresh template manager, used by the
+    worker processes of LogParser.parse_parallel.
+    """
+    templ_mgr = LenmaTemplateManager(threshold=threshold, compressor_instance=compressor, prune=prune,
+                                     dedup_size=dedup_size, dedup_bytes=dedup_bytes)
+    for logid, words in lines:
+        templ_mgr.infer_template(words, logid, mask_digits)
+    # the compressor is pickled back without its cache statistics
+    cache_info = compressor.cache_info() if hasattr(compressor, "cache_info") else None
+    return templ_mgr.templates, templ_mgr.stats, cache_info, len(templ_mgr.compression_dict)
+
+
+_TEMPLATE_DELIMITERS = {
+    r'\s', r'\,', r'\!', r'\;', r'\:',
+    r'\=', r'\|', r'\"', r"\'",
+    r'\[', r'\]', r'\(', r'\)', r'\{', r'\}',
+    r'\.', r'\-', r'\+', r'\@', r'\#', r'\$', r'\%', r'\&',
+}
+# tokenizing while keeping delimiters, all of them single characters
+_TEMPLATE_SPLIT = re.compile('(' + '|'.join(sorted(_TEMPLATE_DELIMITERS)) + ')')
+_WILDCARD_TOKEN = re.compile(r'^[^\s\/]*<\*>[^\s\/]*$')
+_SPACES = re.compile(r'\s+')
+_DOTTED_WILDCARDS = re.compile(r'<\*>\.<\*>')
+
+
 def update_template(template, user_strings=None):
-    path_delimiters = {
-        r'\s', r'\,', r'\!', r'\;', r'\:',
-        r'\=', r'\|', r'\"', r'\'',
-        r'\[', r'\]', r'\(', r'\)', r'\{', r'\}'
-    }
-    token_delimiters = path_delimiters.union({  r'\.', r'\-', r'\+', r'\@', r'\#', r'\$', r'\%', r'\&', })
-    template = template.strip()
-    template = re.sub(r'\s+', ' ', template)
-    tokens = re.split('(' + '|'.join(token_delimiters) + ')', template)  # tokenizing while keeping delimiters
+    template = _SPACES.sub(' ', template.strip())
     new_tokens = []
-    for token in tokens:
-        if re.match(r'^[^\s\/]*<\*>[^\s\/]*$', token):
-            if token != '<*>/<*>':
-                token = '<*>'
-
+    for token in _TEMPLATE_SPLIT.split(template):
+        if token != '<*>/<*>' and _WILDCARD_TOKEN.match(token):
+            token = '<*>'
         new_tokens.append(token)
 
     template = ''.join(new_tokens)
 
     while True:
         prev = template
-        template = re.sub(r'<\*>\.<\*>', '<*>', template)
+        template = _DOTTED_WILDCARDS.sub('<*>', template)
         if prev == template:
             break
     return template
+
+
+# update_template of each distinct template text, computed once
+normalize_template = lru_cache(maxsize=65536)(update_template)
+
+
+def event_id(template):
+    return hashlib.md5(template.encode("utf-8")).hexdigest()[0:8]
@@ -1,14 +1,16 @@
 #LogGzip_template.py：
 import json
 import numpy as np
-from sklearn.metrics import accuracy_score
-from sklearn.metrics.pairwise import cosine_similarity
+from operator import eq
 from logparser.LogGzip.src import template
 from importlib import import_module
 import re
 import pickle
 import os
-import hashlib
+import bisect
+import sys
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 
 def NCD(c1: float, c2: float, c12: float) -> float:
@@ -18,8 +20,54 @@ def agg_by_concat_space(t1: str, t2: str) -> str:
     return t1 + " " + t2
 
 
+def count_same_positions(words, new_words, wildcard=None):
+    """Counts the positions where two word lists of the same length agree.
+
+    If `wildcard` is given, a wildcard in `words` agrees with any word. This
+    replaces sklearn's accuracy_score, whose input validation costs far more
+    than the comparison of two short lists.
+    """
+    count = sum(map(eq, words, new_words))
+    if wildcard is not None and wildcard in words:
+        count += sum(1 for w, n in zip(words, new_words) if w == wildcard and n != wildcard)
+    return count
+
+
+DIGIT_REGEX = re.compile(r'\b\d+\b|\b\w*\d+\w*\b')
+
+
+def bucket_key(words):
+    """Templates a line can be matched against share its word count and
+    first word.
+    """
+    return len(words), words[0] if words else None
+
+
+def shard_key(words, mask_digits=False):
+    """Lines with different shard keys can never end up in the same template,
+    so they can be matched independently.
+
+    With mask_digits, update() may turn the first word of a template into
+    '<*>', after which it absorbs lines starting with '<*>'; such first words
+    therefore share the '<*>' shard.
+    """
+    nwords, first_word = bucket_key(words)
+    if mask_digits and first_word is not None and DIGIT_REGEX.sub('<*>', first_word) != first_word:
+        first_word = '<*>'
+    return nwords, first_word
+
+
 class LenmaTemplate(template.Template):
+    # Millions of lines end up in a few templates, so templates have no
+    # instance __dict__ and keep their logids in a growable int64 buffer
+    # rather than in a list of Python ints.
+    __slots__ = ("_nlogids", "_text", "_compressed_len", "_snapshot", "compressor", "mask_digits")
+
     def __init__(self, index=None, words=None, logid=None, json=None, compressor=None, mask_digits=False):  # Corrected parameter name
+        self._logid = np.empty(0 if logid is None else 1, dtype=np.int64)
+        self._nlogids = 0
+        self.compressor = compressor
+        self.mask_digits = mask_digits
         if json is not None:
             # restore from the jsonized data.
             self._restore_from_json(json)
@@ -30,16 +78,63 @@ class LenmaTemplate(template.Template):
             self._index = index
             self._words = words
             self._nwords = len(words)
-            self._wordlens = [len(w) for w in words]
             self._counts = 1
-            self._logid = [logid]
-            self.compressor = compressor
-            self.mask_digits = mask_digits
+            self._append_logid(logid)
             assert self.compressor is not None, "Compressor instance is None in LenmaTemplate"
+            self._refresh_text()
 
     @property
     def wordlens(self):
-        return self._wordlens
+        return [len(w) for w in self._words]
+
+    @property
+    def text(self):
+        return self._text
+
+    @property
+    def compressed_len(self):
+        if self._compressed_len is None:
+            self._compressed_len = self.compressor.get_compressed_len(self._text)
+        return self._compressed_len
+
+    def _get_combined_len(self, new_text):
+        """Compressed length of the template text followed by `new_text`."""
+        if getattr(self.compressor, "supports_snapshot", False):
+            if self._snapshot is None:
+                self._snapshot = self.compressor.snapshot(agg_by_concat_space(self._text, ""))
+            return self.compressor.get_compressed_len_from(self._snapshot, new_text)
+        # a concatenation is rarely compressed twice, it is not cached
+        return self.compressor.get_compressed_len(agg_by_concat_space(self._text, new_text), cache=False)
+
+    def _refresh_text(self):
+        # The joined template text and its compressed length only change
+        # when update() introduces a new wildcard, so they are kept as
+        # derived state instead of being recomputed for every comparison.
+        self._text = " ".join(self._words)
+        self._compressed_len = None
+        self._snapshot = None
+
+    def __getstate__(self):
+        # compressor snapshots cannot be pickled, they are rebuilt on demand
+        state = {name: getattr(self, name) for cls in type(self).__mro__
+                 for name in getattr(cls, "__slots__", ()) if hasattr(self, name)}
+        state["_snapshot"] = None
+        state["_logid"] = self.get_logids()
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def _append_logid(self, logid):
+        if logid is None:
+            return
+        if self._nlogids == len(self._logid):
+            logids = np.empty(max(4, 2 * self._nlogids), dtype=np.int64)
+            logids[:self._nlogids] = self._logid
+            self._logid = logids
+        self._logid[self._nlogids] = logid
+        self._nlogids += 1
 
     def _dump_as_json(self):
         description = str(self)
@@ -49,21 +144,17 @@ class LenmaTemplate(template.Template):
         (self._index,
          self._words,
          self._nwords,
-         self._wordlens,
+         _,
          self._counts) = json.loads(data)
+        self._refresh_text()
 
     def _try_update(self, new_words):
-        try_update = [self.words[idx] if self._words[idx] == new_words[idx]
-                      else '' for idx in range(self.nwords)]
-        if (self.nwords - try_update.count('')) < 3:
+        if count_same_positions(self._words, new_words) < 3:
             return False
         return True
 
     def _get_accuracy_score(self, new_words):
-
-        fill_wildcard = [self.words[idx] if self.words[idx] != ''
-                         else new_words[idx] for idx in range(self.nwords)]
-        ac_score = accuracy_score(fill_wildcard, new_words)
+        ac_score = count_same_positions(self._words, new_words, wildcard='') / self.nwords
         return ac_score
 
     def _get_wcr(self):
@@ -71,22 +162,18 @@ class LenmaTemplate(template.Template):
 
     def _get_accuracy_score2(self, new_words):
         wildcard_ratio = self._get_wcr()
-        ac_score = accuracy_score(self.words, new_words)
+        ac_score = count_same_positions(self._words, new_words) / self.nwords
         return (ac_score / (1 - wildcard_ratio), wildcard_ratio)
 
 
     def _count_same_word_positions(self, new_words):
-        c = 0
-        for idx in range(self.nwords):
-            if self.words[idx] == new_words[idx]:
-                c = c + 1
-        return c
+        return count_same_positions(self._words, new_words)
 
     def get_compression_distance(self, new_words):
-        compressed_template = self.compressor.get_compressed_len(" ".join(self._words))
-        compressed_new_words = self.compressor.get_compressed_len(" ".join(new_words))
-        combined_text = agg_by_concat_space(" ".join(self._words), " ".join(new_words))
-        compressed_combined = self.compressor.get_compressed_len(combined_text)
+        new_text = " ".join(new_words)
+        compressed_template = self.compressed_len
+        compressed_new_words = self.compressor.get_compressed_len(new_text)
+        compressed_combined = self._get_combined_len(new_text)
 
         distance = NCD(compressed_template, compressed_new_words, compressed_combined)
         return 1 - distance
@@ -104,73 +191,283 @@ class LenmaTemplate(template.Template):
 
     def update(self, new_words, logid):
         if self.mask_digits:
-            digit_regex = re.compile(r'\b\d+\b|\b\w*\d+\w*\b')
-            new_words = [digit_regex.sub('<*>', word) for word in new_words]
+            new_words = [DIGIT_REGEX.sub('<*>', word) for word in new_words]
         self._counts += 1
-        self._wordlens = [len(w) for w in new_words]
-        self._words = [self.words[idx] if self._words[idx] == new_words[idx]
-                       else '<*>' for idx in range(self.nwords)]
-        self._logid.append(logid)
+        words = [self.words[idx] if self._words[idx] == new_words[idx]
+                 else '<*>' for idx in range(self.nwords)]
+        self._append_logid(logid)
+        if words != self._words:
+            self._words = words
+            self._refresh_text()
+            return True
+        return False
 
     def print_wordlens(self):
         print('{index}({nwords})({counts}):{vectors}'.format(
             index=self.index,
             nwords=self.nwords,
             counts=self._counts,
-            vectors=self._wordlens))
+            vectors=self.wordlens))
 
     def get_logids(self):
-        return self._logid
+        """Returns the logids as an int64 array view, without copying."""
+        return self._logid[:self._nlogids]
+
+    def clear_logids(self):
+        """Forgets the logids, e.g. once the lines of a file are written out."""
+        self._logid = np.empty(0, dtype=np.int64)
+        self._nlogids = 0
+
+
+class TemplateBucket(object):
+    """Templates with the same number of words and the same first word, kept
+    in index order together with a matrix of their token ids so that a line
+    can be scored against all of them at once.
+    """
+    WILDCARD_ID = -1  # '' matches any word, as in _get_accuracy_score
+    UNKNOWN_ID = -2  # a word that no template contains
+
+    def __init__(self, nwords):
+        self.templates = []
+        self._indexes = []
+        self._ids = np.empty((4, nwords), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.templates)
+
+    @property
+    def ids(self):
+        return self._ids[:len(self.templates)]
+
+    def add(self, template, ids):
+        row = bisect.bisect(self._indexes, template.index)
+        size = len(self.templates)
+        if size == self._ids.shape[0]:
+            self._ids = np.concatenate([self._ids, np.empty_like(self._ids)])
+        self._ids[row + 1:size + 1] = self._ids[row:size]
+        self._ids[row] = ids
+        self._indexes.insert(row, template.index)
+        self.templates.insert(row, template)
+
+    def remove(self, template):
+        row = bisect.bisect_left(self._indexes, template.index)
+        size = len(self.templates)
+        self._ids[row:size - 1] = self._ids[row + 1:size]
+        del self._indexes[row]
+        del self.templates[row]
+
+    def refresh(self, template, ids):
+        self._ids[bisect.bisect_left(self._indexes, template.index)] = ids
 
 
 class LenmaTemplateManager(template.TemplateManager):
-    def __init__(self, threshold=0.9, predefined_templates=None, compressor_module=None, compressor_instance=None):
+    """Matches lines to templates by compression distance.
+
+    A line seen before goes straight to the template it was matched to,
+    through a dedup table that is unbounded by default. dedup_size (entries,
+    0 disables the table) and dedup_bytes (approximate bytes of keys) bound
+    it as an LRU. The bound changes the result: an evicted line is scored
+    again against templates that may have been generalized since, or moved
+    to another bucket, and can then create a new template.
+    """
+
+    def __init__(self, threshold=0.9, predefined_templates=None, compressor_module=None, compressor_instance=None,
+                 scoring_threads=0, min_parallel_candidates=16, prune=False, dedup_size=None, dedup_bytes=None):
         super().__init__()
         self._threshold = threshold
         self.compressor_instance = compressor_instance
-        self.compression_dict = {}
+
+        # table from the token tuple of a line to the template it was
+        # matched to, in LRU order when bounded
+        self.compression_dict = OrderedDict()
+        self.dedup_size = dedup_size
+        self.dedup_bytes = dedup_bytes
+        self._dedup_nbytes = 0
+        self._vocab = {'': TemplateBucket.WILDCARD_ID}
+        self._buckets = {}
+        self.prune = prune
+        self.stats = Counter()
+
+        # zlib, bz2 and lzma release the GIL while compressing, so the
+        # compression distances of many candidates can be evaluated by a
+        # thread pool; below min_parallel_candidates it is not worth it. The
+        # pool is started on first use, and again after close().
+        self.scoring_threads = scoring_threads
+        self.min_parallel_candidates = min_parallel_candidates
+        self._pool = None
 
         # 确保compressor_instance在传递之前不是None
         assert compressor_instance is not None, "Compressor instance is None before passing to LenmaTemplateManager"
 
-    def infer_template(self, words, logid, mask_digits=False):
-        nwords = len(words)
-        template_key = hashlib.md5(" ".join(words).encode("utf-8")).hexdigest()
+    def __getstate__(self):
+        # the scoring thread pool is started again after unpickling
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        return state
 
-        if template_key in self.compression_dict:
-            existing_template = self.compression_dict[template_key]
+    def infer_template(self, words, logid, mask_digits=False):
+        template_key = tuple(words)
 
+        existing_template = self.compression_dict.get(template_key)
+        if existing_template is not None:
+            self.compression_dict.move_to_end(template_key)
+            self.stats["dedup_hits"] += 1
 
             if not isinstance(existing_template, LenmaTemplate):
                 print(f"Error: Expected LenmaTemplate, but got {type(existing_template)}")
                 return None
 
-            existing_template.update(words, logid)
+            self.add_line(existing_template, words, logid)
             return existing_template
-
-        candidates = []
-        for (index, template) in enumerate(self.templates):
-            if nwords != template.nwords:
-                continue
-            score = template.get_similarity_score(words)
-            if score < self._threshold:
-                continue
-            candidates.append((index, score))
-        candidates.sort(key=lambda c: c[1], reverse=True)
-
-        if len(candidates) > 0:
-            index = candidates[0][0]
-            self.templates[index].update(words, logid)
-            self.compression_dict[template_key] = self.templates[index]
-            return self.templates[index]
+        self.stats["dedup_misses"] += 1
+
+        bucket = self._buckets.get(bucket_key(words))
+        if bucket:
+            scores = self.get_similarity_scores(words, bucket)
+            # first (lowest index) template among the best scores
+            best = int(np.argmax(scores))
+            if scores[best] >= self._threshold:
+                template = bucket.templates[best]
+                self.add_line(template, words, logid)
+                self._remember(template_key, template)
+                return template
 
         new_template = self._append_template(
             LenmaTemplate(index=len(self.templates), words=words, logid=logid, compressor=self.compressor_instance,
                           mask_digits=mask_digits)
         )
-        self.compression_dict[template_key] = new_template
+        self._remember(template_key, new_template)
         return new_template
 
+    def _remember(self, template_key, template):
+        table = self.compression_dict
+        if self.dedup_size == 0:
+            return
+        table[template_key] = template
+        if self.dedup_bytes is not None:
+            self._dedup_nbytes += self._key_nbytes(template_key)
+        while (self.dedup_size is not None and len(table) > self.dedup_size) or (
+            self.dedup_bytes is not None and self._dedup_nbytes > self.dedup_bytes and len(table) > 1
+        ):
+            key, _ = table.popitem(last=False)
+            if self.dedup_bytes is not None:
+                self._dedup_nbytes -= self._key_nbytes(key)
+
+    @staticmethod
+    def _key_nbytes(template_key):
+        return sys.getsizeof(template_key) + sum(sys.getsizeof(w) for w in template_key)
+
+    def clear_logids(self):
+        """Forgets the logids of all templates, keeping the templates."""
+        for template in self.templates:
+            template.clear_logids()
+
+    def dedup_info(self):
+        """Returns (entries, approximate key bytes if bounded, hits, misses)
+        of the dedup table.
+        """
+        return len(self.compression_dict), self._dedup_nbytes, self.stats["dedup_hits"], self.stats["dedup_misses"]
+
+    def merge_templates(self, templates):
+        """Appends the templates inferred by other managers on disjoint
+        shards (see shard_key), in the order they were created.
+
+        Args:
+          templates: An iterable of LenmaTemplate instances.
+        """
+        for template in sorted(templates, key=lambda t: t.get_logids()[0]):
+            template._index = len(self.templates)
+            template.compressor = self.compressor_instance
+            self._append_template(template)
+
+    def get_similarity_scores(self, words, bucket):
+        """Scores a line against every template of a bucket.
+
+        The exact-position match is computed for the whole bucket over the
+        token-id matrix; the compressor is only invoked for the templates
+        that do not match every position.
+
+        prune is a heuristic that skips compressing the concatenation when the
+        score seems unable to reach the threshold. It assumes that
+        C(template + " " + line) is at least max(C(template), C(line)), which
+        makes min(C(template), C(line)) / max(C(template), C(line)) an upper
+        bound of the similarity. Real compressors break the assumption on a
+        few lines (more often bz2 and zstd than zlib), where a template that
+        would have matched is skipped, so it is off by default.
+
+        Args:
+          words: An array of words.
+          bucket: A TemplateBucket of templates with len(words) words and
+            the same first word.
+
+        Returns:
+          scores: a float array, equal to get_similarity_score() of each
+            template, or the estimated bound below the threshold for the
+            pruned ones.
+        """
+        vocab = self._vocab
+        ids = np.array([vocab.get(w, TemplateBucket.UNKNOWN_ID) for w in words], dtype=np.int64)
+        matrix = bucket.ids
+        matches = ((matrix == ids) | (matrix == TemplateBucket.WILDCARD_ID)).sum(axis=1)
+
+        scores = np.ones(len(bucket), dtype=np.float64)
+        rows = np.flatnonzero(matches < len(words))
+        templates = bucket.templates
+        if self.prune and len(rows):
+            compressed_line = self.compressor_instance.get_compressed_len(" ".join(words))
+            compressed_templates = np.array([templates[row].compressed_len for row in rows])
+            bounds = (np.minimum(compressed_templates, compressed_line)
+                      / np.maximum(compressed_templates, compressed_line))
+            pruned = bounds < self._threshold
+            scores[rows[pruned]] = bounds[pruned]
+            rows = rows[~pruned]
+            self.stats["compressions_avoided"] += int(pruned.sum())
+        self.stats["compressions"] += len(rows)
+        if self.scoring_threads > 0 and len(rows) >= self.min_parallel_candidates:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.scoring_threads)
+            scores[rows] = list(self._pool.map(lambda row: templates[row].get_compression_distance(words), rows))
+        else:
+            for row in rows:
+                scores[row] = templates[row].get_compression_distance(words)
+        return scores
+
+    def close(self):
+        """Shuts down the scoring thread pool, if any. It is started again if
+        more lines are scored.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _get_word_ids(self, words):
+        vocab = self._vocab
+        return [vocab.setdefault(w, len(vocab) - 1) for w in words]
+
+    def add_line(self, template, words, logid):
+        """Updates a template with a line already known to match it."""
+        key = bucket_key(template.words)
+        if not template.update(words, logid):
+            return
+        if bucket_key(template.words) == key:
+            self._buckets[key].refresh(template, self._get_word_ids(template.words))
+        else:
+            # the first word became a wildcard, move to the matching bucket
+            self._buckets[key].remove(template)
+            self._add_to_bucket(template)
+
+    def _add_to_bucket(self, template):
+        key = bucket_key(template.words)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TemplateBucket(template.nwords)
+        bucket.add(template, self._get_word_ids(template.words))
+
+    def _append_template(self, template):
+        template = super()._append_template(template)
+        self._add_to_bucket(template)
+        return template
+
     def dump_template(self, index):
         return self.templates[index]._dump_as_json()
 
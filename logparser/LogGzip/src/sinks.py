@@ -0,0 +1,200 @@
+#sinks.py
+import bz2
+import gzip
+import lzma
+from importlib import import_module
+import pandas as pd
+
+
+# Output formats by name, see `register_sink`.
+SINKS = {}
+
+
+def register_sink(name):
+    def decorator(cls):
+        cls.name = name
+        SINKS[name] = cls
+        return cls
+    return decorator
+
+
+class OutputSink(object):
+    """Writes the structured and templates tables of a parse.
+
+    `open(path)` returns a writer taking DataFrame batches, so a table can be
+    written one row group at a time; `write(frame, path)` writes a whole
+    frame in batches of `row_group_size` rows. Categorical columns
+    (EventId/EventTemplate) are dictionary-encoded by formats that support it
+    unless dictionary=False.
+    """
+    extension = ""
+    default_compression = None
+
+    def __init__(self, compression=None, row_group_size=65536, dictionary=True):
+        self.compression = self.default_compression if compression is None else compression
+        self.row_group_size = row_group_size
+        self.dictionary = dictionary
+
+    def path(self, prefix):
+        return prefix + self.extension
+
+    def open(self, path):
+        raise NotImplementedError
+
+    def write(self, frame, path):
+        with self.open(path) as writer:
+            # an empty frame still writes its header or schema
+            for start in range(0, max(len(frame), 1), self.row_group_size):
+                writer.write(frame.iloc[start:start + self.row_group_size])
+
+
+class SinkWriter(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, frame):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+_CSV_OPENERS = {
+    None: (open, ""),
+    "gzip": (gzip.open, ".gz"),
+    "bz2": (bz2.open, ".bz2"),
+    "xz": (lzma.open, ".xz"),
+}
+
+
+@register_sink("csv")
+class CsvSink(OutputSink):
+    """The original CSV output, optionally gzip/bz2/xz compressed."""
+    extension = ".csv"
+
+    def __init__(self, compression=None, row_group_size=65536, dictionary=True):
+        if compression not in _CSV_OPENERS:
+            raise RuntimeError("Unsupported CSV compression: {}".format(compression))
+        super().__init__(compression, row_group_size, dictionary)
+
+    def path(self, prefix):
+        return prefix + self.extension + _CSV_OPENERS[self.compression][1]
+
+    def open(self, path):
+        return CsvWriter(_CSV_OPENERS[self.compression][0](path, "wt", newline=""))
+
+    def write(self, frame, path):
+        # one to_csv call, pandas batches the rows itself
+        with self.open(path) as writer:
+            writer.write(frame)
+
+
+class CsvWriter(SinkWriter):
+    def __init__(self, fout):
+        self.fout = fout
+        self.header = True
+
+    def write(self, frame):
+        frame.to_csv(self.fout, index=False, header=self.header)
+        self.header = False
+
+    def close(self):
+        self.fout.close()
+
+
+class ArrowSink(OutputSink):
+    """Base of the pyarrow formats; pyarrow is only needed when used."""
+
+    def __init__(self, compression=None, row_group_size=65536, dictionary=True):
+        super().__init__(compression, row_group_size, dictionary)
+        try:
+            self.pa = import_module("pyarrow")
+        except ImportError:
+            raise RuntimeError("Unsupported output format: {} needs pyarrow".format(self.name))
+
+    def to_table(self, frame, schema=None):
+        if not self.dictionary:
+            frame = frame.astype({column: object for column in frame.columns
+                                  if isinstance(frame[column].dtype, pd.CategoricalDtype)})
+        table = self.pa.Table.from_pandas(frame, preserve_index=False)
+        if schema is None:
+            # pandas picks the narrowest code type, which changes as the
+            # categories grow; batches must share one schema
+            pa = self.pa
+            schema = pa.schema([
+                field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+                if pa.types.is_dictionary(field.type) else field
+                for field in table.schema
+            ], metadata=table.schema.metadata)
+        return table.cast(schema)
+
+
+class ArrowWriter(SinkWriter):
+    def __init__(self, sink, path):
+        self.sink = sink
+        self.path = path
+        self.schema = None
+        self.writer = None
+
+    def write(self, frame):
+        table = self.sink.to_table(frame, self.schema)
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = self.new_writer(table.schema)
+        self.writer.write_table(table)
+
+    def new_writer(self, schema):
+        raise NotImplementedError
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+@register_sink("parquet")
+class ParquetSink(ArrowSink):
+    """Parquet, one row group per batch."""
+    extension = ".parquet"
+    default_compression = "snappy"
+
+    def open(self, path):
+        return ParquetWriter(self, path)
+
+
+class ParquetWriter(ArrowWriter):
+    def new_writer(self, schema):
+        parquet = import_module("pyarrow.parquet")
+        return parquet.ParquetWriter(self.path, schema, compression=self.sink.compression,
+                                     use_dictionary=self.sink.dictionary)
+
+
+@register_sink("feather")
+class FeatherSink(ArrowSink):
+    """Feather V2 (Arrow IPC file), one record batch per batch.
+
+    Dictionaries that grow from batch to batch are written as deltas, so the
+    categories of a later batch must extend those of the earlier ones.
+    """
+    extension = ".feather"
+    default_compression = "lz4"
+
+    def open(self, path):
+        return FeatherWriter(self, path)
+
+
+class FeatherWriter(ArrowWriter):
+    def new_writer(self, schema):
+        pa = self.sink.pa
+        options = pa.ipc.IpcWriteOptions(compression=self.sink.compression, emit_dictionary_deltas=True)
+        return pa.ipc.new_file(self.path, schema, options=options)
+
+
+def get_sink(name, **options):
+    if isinstance(name, OutputSink):
+        return name
+    if name not in SINKS:
+        raise RuntimeError("Unsupported output format: {}".format(name))
+    return SINKS[name](**options)
@@ -1,5 +1,7 @@
 #template.py的代码如下：
 class Template(object):
+    __slots__ = ("_index", "_words", "_nwords", "_counts", "_logid")
+
     def __init__(self, index, words, logid):
         self._index = index
         self._words = words
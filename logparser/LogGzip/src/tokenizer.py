@@ -0,0 +1,41 @@
+#tokenizer.py
+import regex as re
+
+
+# Delimiter lists that only split on whitespace.
+WHITESPACE_DELIMITERS = [[r'\s+'], [r'\s']]
+
+# str.split() also splits on the information separators, which \s does not
+# match; lines containing them take the regex path.
+_INFO_SEPARATORS = re.compile(r'[\x1c-\x1f]')
+
+
+class Tokenizer(object):
+    """Splits lines into tokens on a list of delimiter regexes.
+
+    Delimiters other than whitespace are kept as tokens, whitespace-only
+    tokens are dropped. Built once from the delimiters: whitespace-only
+    delimiters use str.split, anything else a single compiled pattern.
+    """
+
+    def __init__(self, delimiters):
+        self.delimiters = list(delimiters)
+        self._split = re.compile('(' + '|'.join(self.delimiters) + ')').split
+        self.whitespace_only = self.delimiters in WHITESPACE_DELIMITERS
+
+    def _regex_tokenize(self, line):
+        return [token for token in self._split(line) if token.strip()]
+
+    def __call__(self, line):
+        if self.whitespace_only and not _INFO_SEPARATORS.search(line):
+            return line.split()
+        return self._regex_tokenize(line)
+
+    def batch(self, lines):
+        """Tokenizes a list of lines at once."""
+        if self.whitespace_only:
+            search = _INFO_SEPARATORS.search
+            slow = self._regex_tokenize
+            return [slow(line) if search(line) else line.split() for line in lines]
+        split = self._split
+        return [[token for token in split(line) if token.strip()] for line in lines]
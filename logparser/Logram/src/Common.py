@@ -4,6 +4,7 @@ https://github.com/BlueLionLogram/Logram/tree/master/Evaluation
 """
 
 import regex as re
+from ...utils.logformat import LogFormat
 
 MyRegex = [
     r"blk_(|-)[0-9]+",  # block id
@@ -35,16 +36,4 @@ def tokenSpliter(logLine, regex, specialRegex):
 
 
 def regexGenerator(logformat):
-    headers = []
-    splitters = re.split(r"(<[^<>]+>)", logformat)
-    regex = ""
-    for k in range(len(splitters)):
-        if k % 2 == 0:
-            splitter = re.sub(" +", "\\\s+", splitters[k])
-            regex += splitter
-        else:
-            header = splitters[k].strip("<").strip(">")
-            regex += "(?P<%s>.*?)" % header
-            headers.append(header)
-    regex = re.compile("^" + regex + "$")
-    return regex
+    return LogFormat(logformat)
@@ -5,6 +5,7 @@ https://github.com/BlueLionLogram/Logram/tree/master/Evaluation
 
 from .Common import regexGenerator
 from .Common import tokenSpliter
+from ...utils.logfile import open_log
 
 
 def dictionaryBuilder(log_format, logFile, rex):
@@ -15,7 +16,7 @@ def dictionaryBuilder(log_format, logFile, rex):
 
     regex = regexGenerator(log_format)
 
-    for line in open(logFile, "r"):
+    for line in open_log(logFile):
         tokens, message = tokenSpliter(line, regex, rex)
         allMessageList.append(message)
         if tokens == None:
@@ -19,6 +19,7 @@ import os
 import pandas as pd
 import hashlib
 from datetime import datetime
+from ..utils.logloader import LogLoader
 
 
 class LCSObject:
@@ -58,6 +59,7 @@ class LogParser:
         tau=0.5,
         rex=[],
         keep_para=True,
+        load_workers=1,
     ):
         self.path = indir
         self.logName = None
@@ -67,6 +69,7 @@ class LogParser:
         self.df_log = None
         self.rex = rex
         self.keep_para = keep_para
+        self.load_workers = load_workers
 
     def LCS(self, seq1, seq2):
         lengths = [[0 for j in range(len(seq2) + 1)] for i in range(len(seq1) + 1)]
@@ -307,51 +310,15 @@ class LogParser:
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - starttime))
 
     def load_data(self):
-        headers, regex = self.generate_logformat_regex(self.logformat)
-        self.df_log = self.log_to_dataframe(
-            os.path.join(self.path, self.logname), regex, headers, self.logformat
-        )
+        loader = LogLoader(self.logformat, n_workers=self.load_workers, non_ascii="<NASCII>", renumber=True,
+                           replace_first=True)
+        self.df_log = loader.load_to_dataframe(os.path.join(self.path, self.logname))
 
     def preprocess(self, line):
         for currentRex in self.rex:
             line = re.sub(currentRex, "<*>", line)
         return line
 
-    def log_to_dataframe(self, log_file, regex, headers, logformat):
-        """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                line = re.sub(r"[^\x00-\x7F]+", "<NASCII>", line)
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
-
-    def generate_logformat_regex(self, logformat):
-        """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
-
     def get_parameter_list(self, row):
         template_regex = re.sub(r"<.{1,5}>", "<*>", row["EventTemplate"])
         if "<*>" not in template_regex:
@@ -0,0 +1,88 @@
+#benchmark_loader.py：
+# Measures the loading throughput of LogLoader, which every parser uses to
+# turn its input into a DataFrame, on the log formats of all parser
+# benchmarks. Each loghub_24 log is repeated to a larger file and loaded
+# with 1 and n_workers processes.
+import sys
+sys.path.append("../../")
+from logparser.utils.logloader import LogLoader
+import ast
+import glob
+import os
+import shutil
+import tempfile
+import time
+import pandas as pd
+
+input_dir = "../../data/loghub_24/"  # The input directory of log files
+repeat = 50  # Copies of each 2k-line log, i.e. 100k lines per file
+n_workers = max(os.cpu_count() or 1, 2)
+parsers_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def benchmark_formats():
+    """(log_format, log_file) pairs of the benchmark settings of all parsers."""
+    pairs = set()
+    for path in glob.glob(os.path.join(parsers_dir, "*", "benchmark.py")):
+        with open(path) as fin:
+            tree = ast.parse(fin.read())
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Dict):
+                continue
+            setting = {}
+            for key, value in zip(node.keys, node.values):
+                # literal_eval rather than ast.Constant, which older Pythons
+                # do not produce for strings; key is None for **mapping
+                try:
+                    setting[ast.literal_eval(key)] = ast.literal_eval(value)
+                except (ValueError, TypeError, SyntaxError):
+                    pass
+            if isinstance(setting.get("log_format"), str) and isinstance(setting.get("log_file"), str):
+                pairs.add((setting["log_format"], setting["log_file"]))
+    return sorted(pairs)
+
+
+def find_log(log_file):
+    path = os.path.join(input_dir, log_file)
+    if not os.path.exists(path):  # e.g. data/loghub_24/linux
+        directory, name = os.path.split(log_file)
+        path = os.path.join(input_dir, directory.lower(), name)
+    return path if os.path.exists(path) else None
+
+
+def time_loading(log_format, path, workers):
+    loader = LogLoader(log_format, n_workers=workers, non_ascii=None, renumber=True)
+    start_time = time.time()
+    df_log = loader.load_to_dataframe(path)
+    return time.time() - start_time, df_log, loader.skipped
+
+
+if __name__ == "__main__":
+    tmp_dir = tempfile.mkdtemp()
+    benchmark_result = []
+    try:
+        for log_format, log_file in benchmark_formats():
+            path = find_log(log_file)
+            if path is None:
+                print("Missing %s" % os.path.join(input_dir, log_file))
+                continue
+            big_path = os.path.join(tmp_dir, os.path.basename(log_file))
+            with open(path, "rb") as fin:
+                data = fin.read()
+            if not data.endswith(b"\n"):
+                data += b"\n"
+            with open(big_path, "wb") as fout:
+                for _ in range(repeat):
+                    fout.write(data)
+            serial_time, df_serial, skipped = time_loading(log_format, big_path, 1)
+            parallel_time, df_parallel, _ = time_loading(log_format, big_path, n_workers)
+            nloaded = len(df_serial)
+            benchmark_result.append([log_file, log_format, nloaded, skipped, round(nloaded / serial_time),
+                                     round(nloaded / parallel_time), df_serial.equals(df_parallel)])
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    df_result = pd.DataFrame(benchmark_result, columns=["Log", "Format", "Loaded", "Skipped",
+                                                        "Lines/s", "Lines/s (%d workers)" % n_workers, "Same"])
+    print("=== Loading throughput, %d copies of each log ===" % repeat)
+    print(df_result.to_string(index=False))
@@ -0,0 +1,221 @@
+"""This file implements the memory-mapped and the tailing readers of log lines"""
+
+import locale
+import mmap
+import os
+import re
+from logparser.utils.logfile import detect_compression, open_log
+
+
+class LineReader(object):
+    """Reads the lines of a log file through mmap, one chunk at a time.
+
+    Line boundaries are found on the raw bytes and every chunk of whole lines
+    is decoded at once, so the file is never held as a list of `str`. Lines
+    are returned without their line break and are split like a text-mode
+    file (universal newlines), which makes the result the same as iterating
+    over `open(path)`. The encoding must be ASCII-compatible (e.g. utf-8,
+    latin-1).
+
+    With start/end, only the lines whose first byte lies in [start, end) are
+    read and a line crossing `end` is read to its end, so consecutive ranges
+    cover every line exactly once. Ranges are aligned on b"\\n".
+
+    Compressed files (see `open_log`) cannot be mapped: they are decompressed
+    as a stream, optionally in a background thread, and read from start to
+    end.
+    """
+
+    def __init__(self, path, start=0, end=None, chunk_size=1 << 20, encoding=None, errors="strict",
+                 background=False):
+        self.path = path
+        self.compression = detect_compression(path)
+        if self.compression is not None and (start or end is not None):
+            raise ValueError("Byte ranges need an uncompressed file, %s is %s" % (path, self.compression))
+        self.size = os.path.getsize(path)
+        self.start = start
+        self.end = self.size if end is None else end
+        self.chunk_size = chunk_size
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.errors = errors
+        self.background = background
+
+    def __iter__(self):
+        for lines in self.chunks():
+            yield from lines
+
+    def chunks(self):
+        """Yields lists of lines, read about chunk_size bytes at a time."""
+        if self.compression is not None:
+            yield from self._stream_chunks()
+            return
+        if self.size == 0:  # empty files cannot be mapped
+            return
+        with open(self.path, "rb") as fin, mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = align(mm, self.start)
+            end = align(mm, self.end)
+            released = pos - pos % mmap.PAGESIZE
+            while pos < end:
+                stop = min(pos + self.chunk_size, end)
+                if stop < end:
+                    newline = mm.rfind(b"\n", pos, stop)
+                    if newline < 0:  # a line longer than chunk_size
+                        newline = mm.find(b"\n", stop, end)
+                    stop = end if newline < 0 else newline + 1
+                yield split_lines(mm[pos:stop].decode(self.encoding, self.errors))
+                pos = stop
+                released = release(mm, released, pos)
+
+    def _stream_chunks(self):
+        rest = b""
+        with open_log(self.path, "rb", buffer_size=self.chunk_size, background=self.background) as fin:
+            while True:
+                block = fin.read(self.chunk_size)
+                if not block:
+                    break
+                block = rest + block
+                newline = block.rfind(b"\n")
+                if newline < 0:
+                    rest = block
+                    continue
+                rest = block[newline + 1:]
+                yield split_lines(block[:newline + 1].decode(self.encoding, self.errors))
+        if rest:
+            yield split_lines(rest.decode(self.encoding, self.errors))
+
+
+def release(mm, start, stop):
+    """Drops the mapped pages of [start, stop) that were read, so the
+    resident size stays at about one chunk. Returns the next page to drop.
+    """
+    stop -= stop % mmap.PAGESIZE
+    if stop > start and hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+        mm.madvise(mmap.MADV_DONTNEED, start, stop - start)
+    return max(start, stop)
+
+
+def align(mm, offset):
+    """Offset of the first line starting at or after `offset`."""
+    if offset <= 0:
+        return 0
+    if offset >= len(mm):
+        return len(mm)
+    newline = mm.find(b"\n", offset - 1)
+    return len(mm) if newline < 0 else newline + 1
+
+
+LINE_BREAK = re.compile(rb"\r\n|\r|\n")
+
+
+def line_ends(data, offset=0):
+    """End offsets, counted from `offset`, of the lines split_lines finds in
+    the decoded data.
+    """
+    ends = [offset + match.end() for match in LINE_BREAK.finditer(data)]
+    if data and data[-1:] not in (b"\r", b"\n"):  # a last line without a line break
+        ends.append(offset + len(data))
+    return ends
+
+
+def split_lines(text):
+    """Splits decoded whole lines the way a text-mode file does."""
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = text.split("\n")
+    if lines[-1] == "":  # the text ended with a line break
+        lines.pop()
+    return lines
+
+
+class TailReader(object):
+    """Reads the lines appended to a growing log file, following rotation.
+
+    `read()` returns the next complete lines, about chunk_size bytes at a
+    time, or [] when there is nothing new; a line still being written is
+    returned once its line break is. When the file at `path` is replaced
+    (rotated by renaming, detected by its inode) the rest of the old file is
+    read before switching to the new one; when it shrinks (truncated in
+    place) it is read again from the start.
+
+    `offset` and `inode` are the position after the lines returned so far;
+    given back to a new reader they resume from there. If `path` is another
+    file by then, it is read from its start. After each `read()`, `ends`
+    holds the offset after each returned line in the file `ends_inode`, so
+    that a caller can also resume after any of them. The lines of one read
+    all come from the same file.
+    """
+
+    def __init__(self, path, offset=0, inode=None, chunk_size=1 << 20, encoding=None, errors="strict"):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.errors = errors
+        self._fin = None
+        self.inode = None
+        self.offset = 0
+        self.ends = []
+        self.ends_inode = None
+        if self._open() and (inode is None or tuple(inode) == self.inode):
+            self.offset = offset if offset <= os.fstat(self._fin.fileno()).st_size else 0
+
+    def _open(self):
+        try:
+            self._fin = open(self.path, "rb")
+        except FileNotFoundError:  # between the rotation and the new file
+            return False
+        st = os.fstat(self._fin.fileno())
+        self.inode = (st.st_dev, st.st_ino)
+        self.offset = 0
+        return True
+
+    def read(self):
+        self.ends = []
+        if self._fin is None and not self._open():
+            return []
+        lines = self._read_chunk()
+        if lines:
+            return lines
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        if (st.st_dev, st.st_ino) != self.inode:
+            # rotated, the old file was read to its last line break
+            self._fin.seek(self.offset)
+            rest = self._fin.read()
+            self._fin.close()
+            self._fin = None
+            if rest:
+                # the new file is read by the next call
+                self.ends = line_ends(rest, self.offset)
+                self.ends_inode = self.inode
+                self.offset += len(rest)
+                return split_lines(rest.decode(self.encoding, self.errors))
+            return self._read_chunk() if self._open() else []
+        if st.st_size < self.offset:
+            self.offset = 0
+            return self._read_chunk()
+        return []
+
+    def _read_chunk(self):
+        fin = self._fin
+        fin.seek(self.offset)
+        data = fin.read(self.chunk_size)
+        newline = data.rfind(b"\n")
+        while newline < 0:  # a line longer than chunk_size, or not complete yet
+            more = fin.read(self.chunk_size)
+            if not more:
+                return []
+            newline = more.find(b"\n")
+            if newline >= 0:
+                newline += len(data)
+            data += more
+        self.ends = line_ends(data[:newline + 1], self.offset)
+        self.ends_inode = self.inode
+        self.offset += newline + 1
+        return split_lines(data[:newline + 1].decode(self.encoding, self.errors))
+
+    def close(self):
+        if self._fin is not None:
+            self._fin.close()
+            self._fin = None
@@ -0,0 +1,141 @@
+"""This file implements the opening of plain and compressed log files"""
+
+import bz2
+import gzip
+import io
+import lzma
+import queue
+import re
+import threading
+from importlib import import_module
+
+
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+# Leading bytes of each supported compression format. A bz2 stream starts
+# with "BZh", the block size digit and the magic of its first block (or of
+# the end of stream when it is empty), so that text starting with "BZh" is
+# not taken for bz2.
+MAGIC_BYTES = [
+    (re.compile(rb"\x1f\x8b"), "gzip"),
+    (re.compile(rb"BZh[1-9](?:1AY&SY|\x17rE8P\x90)"), "bz2"),
+    (re.compile(rb"\xfd7zXZ\x00"), "xz"),
+    (re.compile(rb"\x28\xb5\x2f\xfd"), "zstd"),
+]
+# Enough leading bytes for every magic above.
+MAGIC_SIZE = 10
+
+
+def detect_compression(path):
+    """Returns "gzip", "bz2", "xz" or "zstd" from the magic bytes of a file,
+    None if it is not compressed.
+    """
+    with open(path, "rb") as fin:
+        head = fin.read(MAGIC_SIZE)
+    for magic, name in MAGIC_BYTES:
+        if magic.match(head):
+            return name
+    return None
+
+
+def _open_zstd(path):
+    try:
+        zstandard = import_module("zstandard")
+    except ImportError:
+        raise RuntimeError("Unsupported compression: zstd needs zstandard")
+    fin = open(path, "rb")
+    # read_across_frames: files written by several zstd calls hold several frames
+    return zstandard.ZstdDecompressor().stream_reader(fin, read_size=DEFAULT_BUFFER_SIZE,
+                                                      read_across_frames=True, closefd=True)
+
+
+DECOMPRESSORS = {
+    "gzip": lambda path: gzip.open(path, "rb"),
+    "bz2": lambda path: bz2.open(path, "rb"),
+    "xz": lambda path: lzma.open(path, "rb"),
+    "zstd": _open_zstd,
+}
+
+
+def open_log(path, mode="r", encoding=None, errors=None, buffer_size=DEFAULT_BUFFER_SIZE, background=False):
+    """Opens a log file for reading, decompressing it on the fly.
+
+    The compression is detected from the magic bytes, not the file name.
+    mode is "r" (text, universal newlines, like `open`) or "rb". The
+    decompressed stream is read `buffer_size` bytes at a time; with
+    background=True the decompression runs in a thread a few blocks ahead of
+    the reader, which overlaps it with parsing since zlib, bz2, lzma and zstd
+    release the GIL.
+    """
+    if mode not in ("r", "rt", "rb"):
+        raise ValueError("open_log only reads, got mode %r" % mode)
+    compression = detect_compression(path)
+    if compression is None:
+        if mode == "rb":
+            return open(path, "rb", buffering=buffer_size)
+        return open(path, "r", buffering=buffer_size, encoding=encoding, errors=errors)
+
+    raw = DECOMPRESSORS[compression](path)
+    if background:
+        raw = BackgroundReader(raw, buffer_size)
+    binary = io.BufferedReader(raw, buffer_size)
+    if mode == "rb":
+        return binary
+    return io.TextIOWrapper(binary, encoding=encoding, errors=errors)
+
+
+class BackgroundReader(io.RawIOBase):
+    """Reads a stream in a background thread, up to `depth` blocks ahead."""
+
+    def __init__(self, fin, block_size=DEFAULT_BUFFER_SIZE, depth=4):
+        self._queue = queue.Queue(depth)
+        self._stop = threading.Event()
+        self._block = memoryview(b"")
+        self._eof = False
+        self._thread = threading.Thread(target=self._fill, args=(fin, block_size), daemon=True)
+        self._thread.start()
+
+    def _fill(self, fin, block_size):
+        try:
+            with fin:
+                while not self._stop.is_set():
+                    block = fin.read(block_size)
+                    if not self._put(block) or not block:
+                        return
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        # gives up once the reader is closed, so the thread always ends
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self._block:
+            if self._eof:
+                return 0
+            block = self._queue.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self._eof = True
+                return 0
+            self._block = memoryview(block)
+        n = min(len(buffer), len(self._block))
+        buffer[:n] = self._block[:n]
+        self._block = self._block[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+        super().close()
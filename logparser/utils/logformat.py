@@ -0,0 +1,197 @@
+"""This file implements the compiler from log formats to header extractors"""
+
+import string
+import regex as re
+
+
+def generate_logformat_regex(logformat):
+    """Function to generate regular expression to split log messages"""
+    headers = []
+    splitters = re.split(r"(<[^<>]+>)", logformat)
+    regex = ""
+    for k in range(len(splitters)):
+        if k % 2 == 0:
+            splitter = re.sub(" +", "\\\\s+", splitters[k])
+            regex += splitter
+        else:
+            header = splitters[k].strip("<").strip(">")
+            regex += "(?P<%s>.*?)" % header
+            headers.append(header)
+    regex = re.compile("^" + regex + "$")
+    return headers, regex
+
+
+def is_unsafe(line):
+    """Whether the split fast path and the regex could disagree on a line:
+    str.isspace() is true for \\x1c-\\x1f but \\s does not match them, and `.`
+    does not match \\n.
+    """
+    return "\n" in line or "\x1c" in line or "\x1d" in line or "\x1e" in line or "\x1f" in line
+
+
+_REGEX_SPECIAL = set(".^$*+?{}[]|()\\")
+
+# Kinds of separator between two fields.
+SPACES = "spaces"  # " +" in the format, one or more whitespace characters
+LITERAL = "literal"  # fixed text without whitespace
+LITERAL_SPACES = "literal_spaces"  # fixed text then whitespace, e.g. ": "
+PATTERN = "pattern"  # any other mix of fixed text and whitespace, e.g. " - "
+
+
+def parse_literal(text):
+    """Splits the literal text of a format into fixed strings and None for
+    the whitespace runs. Returns None if it has regex syntax, such as an
+    optional group or a `.`, which only the regex can match.
+    """
+    tokens = []
+    k = 0
+    while k < len(text):
+        char = text[k]
+        if char == " ":
+            while k < len(text) and text[k] == " ":
+                k += 1
+            tokens.append(None)
+            continue
+        if char == "\\":
+            if k + 1 == len(text) or text[k + 1] not in string.punctuation:
+                return None
+            char = text[k + 1]
+            k += 1
+        elif char in _REGEX_SPECIAL:
+            return None
+        if tokens and tokens[-1] is not None:
+            tokens[-1] += char
+        else:
+            tokens.append(char)
+        k += 1
+    return tokens
+
+
+class LogFormat(object):
+    """A log format such as `<Date> <Time> <Level>: <Content>`, compiled to
+    split lines into their header fields.
+
+    The format is matched by an anchored regex of lazy `(?P<x>.*?)` groups,
+    which backtracks over the whole line. When the format is a literal
+    prefix followed by fields separated by fixed literals, the fields are cut
+    with str.split/str.find instead: each field ends at the first occurrence
+    of the next separator, which is the match the lazy regex tries first. If
+    that fails on a line, or the line has a character on which the two could
+    disagree, the line is matched with the regex, so the result is always the
+    same as the regex. Formats with regex syntax, e.g. optional groups, only
+    use the regex.
+
+    `search(line)` is a drop-in replacement for the compiled regex: it
+    returns an object with `group(header)`, or None.
+    """
+
+    def __init__(self, logformat):
+        self.logformat = logformat
+        self.headers, self.regex = generate_logformat_regex(logformat)
+        self.prefix, self.steps = self._compile(logformat)
+
+    def __reduce__(self):
+        # compiled again on unpickling, the step kinds are compared by identity
+        return LogFormat, (self.logformat,)
+
+    @property
+    def pattern(self):
+        return self.regex.pattern
+
+    @property
+    def is_split(self):
+        """Whether the split extractor is used."""
+        return self.steps is not None
+
+    @staticmethod
+    def _compile(logformat):
+        literals = re.split(r"<[^<>]+>", logformat)
+        parsed = [parse_literal(literal) for literal in literals]
+        # the last field must run to the end of the line, the others must be
+        # separated by something
+        if any(tokens is None for tokens in parsed) or parsed[-1] or not all(parsed[1:-1]):
+            return None, None
+        if None in parsed[0]:  # whitespace before the first field
+            return None, None
+        prefix = "".join(parsed[0])
+        steps = []
+        for tokens in parsed[1:-1]:
+            if tokens == [None]:
+                if steps and steps[-1][0] == SPACES:
+                    steps[-1] = (SPACES, steps[-1][1] + 1)
+                else:
+                    steps.append((SPACES, 1))
+            elif None not in tokens:
+                steps.append((LITERAL, tokens[0]))
+            elif len(tokens) == 2 and tokens[1] is None:
+                steps.append((LITERAL_SPACES, tokens[0]))
+            else:
+                pattern = "".join("\\s+" if token is None else re.escape(token) for token in tokens)
+                steps.append((PATTERN, re.compile(pattern)))
+        return prefix, steps
+
+    def extract(self, line):
+        """Returns the header values of a line, None if it does not match."""
+        if self.steps is None or is_unsafe(line):
+            return self._regex_extract(line)
+        if not line.startswith(self.prefix):
+            return None
+        values = []
+        rest = line[len(self.prefix):]
+        for kind, arg in self.steps:
+            if kind is SPACES:
+                parts = rest.split(None, arg)
+                if len(parts) <= arg or rest[:1].isspace():
+                    return self._regex_extract(line)
+                values.extend(parts[:arg])
+                rest = parts[arg]
+            elif kind is LITERAL:
+                end = rest.find(arg)
+                if end < 0:
+                    return self._regex_extract(line)
+                values.append(rest[:end])
+                rest = rest[end + len(arg):]
+            elif kind is LITERAL_SPACES:
+                end = rest.find(arg)
+                while end >= 0 and not rest[end + len(arg):end + len(arg) + 1].isspace():
+                    end = rest.find(arg, end + 1)
+                if end < 0:
+                    return self._regex_extract(line)
+                values.append(rest[:end])
+                rest = rest[end + len(arg):].lstrip()
+            else:
+                match = arg.search(rest)
+                if match is None:
+                    return self._regex_extract(line)
+                values.append(rest[:match.start()])
+                rest = rest[match.end():]
+        values.append(rest)
+        return values
+
+    def _regex_extract(self, line):
+        match = self.regex.search(line)
+        if match is None:
+            return None
+        return [match.group(header) for header in self.headers]
+
+    def search(self, line):
+        if self.steps is None:
+            return self.regex.search(line)
+        values = self.extract(line)
+        if values is None:
+            return None
+        return FormatMatch(dict(zip(self.headers, values)))
+
+
+class FormatMatch(object):
+    """The fields of a line, with the `group` interface of a regex match."""
+    __slots__ = ("_fields",)
+
+    def __init__(self, fields):
+        self._fields = fields
+
+    def group(self, header):
+        return self._fields[header]
+
+    def groupdict(self):
+        return dict(self._fields)
@@ -16,88 +16,259 @@
 """This file implements the formating interface to load log file to dataframe"""
 
 import multiprocessing as mp
-from itertools import groupby, count, chain
+import os
+from importlib import import_module
 import pandas as pd
 import regex as re
 import numpy as np
+from .linereader import LineReader
+from .logfile import detect_compression
+from .logformat import LogFormat
+
+
+NON_ASCII = re.compile(r"[^\x00-\x7F]+")
 
 
 class LogLoader(object):
-    def __init__(self, logformat, n_workers=1):
+    """Loads a log file into a DataFrame of its header fields, with a LineId.
+
+    This is the loader of all parsers. Lines are read through mmap one chunk
+    at a time (see `LineReader`) and split by a compiled `LogFormat`; with
+    n_workers > 1 the file is loaded in byte ranges by a process pool. Blank
+    lines are dropped, lines that do not match the format are counted and
+    reported once rather than printed one by one.
+
+    non_ascii is the replacement of each run of non-ASCII characters, None
+    to keep them. Lines are stripped first, or with replace_first=True
+    replaced first, which keeps non-ASCII whitespace at their ends as the
+    marker. LineId is the line number in the file, or with renumber=True
+    the number of the line among the loaded ones.
+    """
+
+    def __init__(self, logformat, n_workers=1, ranges_per_worker=4, non_ascii="<N/ASCII>", renumber=False,
+                 replace_first=False):
         if not logformat:
             raise RuntimeError("Logformat is required!")
-        self.logformat = logformat.strip()
-        self.headers, self.regex = self._generate_logformat_regex(self.logformat)
+        if isinstance(logformat, LogFormat):
+            self.logformat = logformat.logformat
+            self.headers, self.regex = logformat.headers, logformat
+        else:
+            self.logformat = logformat.strip()
+            self.headers, self.regex = self._generate_logformat_regex(self.logformat)
         self.n_workers = n_workers
+        self.ranges_per_worker = ranges_per_worker
+        self.non_ascii = non_ascii
+        self.replace_first = replace_first
+        self.renumber = renumber
+        self.skipped = 0
 
     def load_to_dataframe(self, log_filepath):
-        """Function to transform log file to dataframe"""
-        print("Loading log messages to dataframe...")
-        lines = []
-        with open(log_filepath, "r") as fid:
-            lines = fid.readlines()
+        """Function to transform log file to dataframe
 
-        log_messages = []
-        if self.n_workers == 1:
-            log_messages = formalize_message(enumerate(lines), self.regex, self.headers)
+        With several workers, the file is cut into byte ranges and each
+        worker gets only (path, start, end): it aligns the range to line
+        boundaries, loads it and returns its columns through shared memory,
+        or pickled before Python 3.8, which has no shared memory. Compressed
+        files cannot be cut and are loaded by a single process.
+        """
+        print("Loading log messages to dataframe...")
+        size = os.path.getsize(log_filepath)
+        if self.n_workers <= 1 or detect_compression(log_filepath) is not None or size == 0:
+            results = [load_range(log_filepath, 0, None, self.regex, self.non_ascii, self.replace_first)]
         else:
-            chunk_size = np.ceil(len(lines) / float(self.n_workers))
-            chunks = groupby(
-                enumerate(lines), key=lambda k, line=count(): next(line) // chunk_size
-            )
-            log_chunks = [list(chunk) for _, chunk in chunks]
-            print("Read %d log chunks in parallel" % len(log_chunks))
-            pool = mp.Pool(processes=self.n_workers)
-            result_chunks = [
-                pool.apply_async(
-                    formalize_message, args=(chunk, self.regex, self.headers)
-                )
-                for chunk in log_chunks
-            ]
-            pool.close()
-            pool.join()
-            log_messages = list(chain(*[result.get() for result in result_chunks]))
-
-        if not log_messages:
+            nranges = self.n_workers * self.ranges_per_worker
+            bounds = [size * k // nranges for k in range(nranges + 1)]
+            share = has_shared_memory()
+            tasks = [(log_filepath, start, end, self.regex, self.non_ascii, self.replace_first, share)
+                     for start, end in zip(bounds, bounds[1:])]
+            print("Read %d log chunks in parallel" % len(tasks))
+            if share:
+                # workers must share the tracker of the parent, which frees the blocks
+                import_module("multiprocessing.resource_tracker").ensure_running()
+            with mp.Pool(processes=self.n_workers) as pool:
+                # in file order, each range is unpacked while the next ones load
+                results = [unshare_columns(result) if share else result
+                           for result in pool.imap(_load_range, tasks)]
+
+        line_ids, columns, nlines, skipped = concat_ranges(results, len(self.headers))
+        self.report_skipped(*skipped)
+        if not len(line_ids):
             raise RuntimeError("Logformat error or log file is empty!")
-        log_dataframe = pd.DataFrame(log_messages, columns=["LineId"] + self.headers)
-        success_rate = len(log_messages) / float(len(lines))
+        if self.renumber:
+            line_ids = np.arange(1, len(line_ids) + 1)
+        log_dataframe = pd.DataFrame(dict(zip(["LineId"] + self.headers, [line_ids] + columns)))
+        success_rate = len(line_ids) / float(nlines)
         print(
             "Loading {} messages done, loading rate: {:.1%}".format(
-                len(log_messages), success_rate
+                len(line_ids), success_rate
             )
         )
         return log_dataframe
 
+    def iter_messages(self, log_filepath, start=0, end=None, background=False):
+        """Yields the header values of each loaded line, one list per line,
+        for parsers that match lines as they are read. start/end restrict it
+        to the lines starting in that byte range, background decompresses
+        compressed files in a thread.
+        """
+        skipped, example = 0, None
+        for lines in LineReader(log_filepath, start, end, background=background).chunks():
+            messages, (chunk_skipped, chunk_example) = self.extract_lines(lines)
+            skipped += chunk_skipped
+            example = example or chunk_example
+            yield from messages
+        self.report_skipped(skipped, example)
+
+    def extract_lines(self, lines):
+        """Returns the header values of the loaded lines of a list of lines,
+        and (count, first line) of the lines that do not match.
+        """
+        extract = self.regex.extract
+        non_ascii = self.non_ascii
+        replace_first = non_ascii is not None and self.replace_first
+        replace_last = non_ascii is not None and not self.replace_first
+        messages = []
+        skipped, example = 0, None
+        for line in lines:
+            if replace_first:
+                line = NON_ASCII.sub(non_ascii, line)
+            line = line.strip()
+            if not line:
+                continue
+            if replace_last:
+                line = NON_ASCII.sub(non_ascii, line)
+            values = extract(line)
+            if values is None:
+                skipped += 1
+                example = example or line
+                continue
+            messages.append(values)
+        return messages, (skipped, example)
+
+    def report_skipped(self, skipped, example):
+        self.skipped = skipped
+        if skipped:
+            print("[Warning] Skipped {} lines not matching the log format, e.g.: {}".format(skipped, example))
+
     def _generate_logformat_regex(self, logformat):
         """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
-
-
-def formalize_message(enumerated_lines, regex, headers):
-    log_messages = []
-    for line_count, line in enumerated_lines:
+        logformat = LogFormat(logformat)
+        return logformat.headers, logformat
+
+
+def load_range(log_filepath, start, end, logformat, non_ascii=None, replace_first=False, share=False):
+    """Loads the lines starting in the byte range [start, end) of a file.
+
+    Returns (line_ids, columns, nlines, skipped): the 1-based line numbers
+    within the range of the loaded lines, one list per header, the number of
+    lines read, loaded or not, and (count, first line) of the lines that do
+    not match. With share=True the columns are moved to shared memory, see
+    `share_columns`.
+    """
+    extract = logformat.extract
+    replace_last = non_ascii is not None and not replace_first
+    replace_first = non_ascii is not None and replace_first
+    line_ids = []
+    rows = []
+    nlines = 0
+    skipped, example = 0, None
+    for nlines, line in enumerate(LineReader(log_filepath, start, end), 1):
+        if replace_first:
+            line = NON_ASCII.sub(non_ascii, line)
         line = line.strip()
         if not line:
             continue
-        line = re.sub(r"[^\x00-\x7F]+", "<N/ASCII>", line)
-        try:
-            match = regex.search(line)
-            message = [match.group(header) for header in headers]
-            message.insert(0, line_count + 1)
-            log_messages.append(message)
-        except Exception as e:
-            print("Skip line: " + line)
-    return log_messages
+        if replace_last:
+            line = NON_ASCII.sub(non_ascii, line)
+        values = extract(line)
+        if values is None:
+            skipped += 1
+            example = example or line
+            continue
+        line_ids.append(nlines)
+        rows.append(values)
+    columns = [list(column) for column in zip(*rows)] or [[] for _ in logformat.headers]
+    result = (np.array(line_ids, dtype=np.int64), columns, nlines, (skipped, example))
+    return share_columns(*result) if share else result
+
+
+def _load_range(task):
+    return load_range(*task)
+
+
+def has_shared_memory():
+    """Whether multiprocessing.shared_memory exists, i.e. Python >= 3.8."""
+    try:
+        import_module("multiprocessing.shared_memory")
+    except ImportError:
+        return False
+    return True
+
+
+def share_columns(line_ids, columns, nlines, skipped):
+    """Packs the result of a range into one shared memory block: the line
+    ids, then every column as utf-8 text joined by newlines, which cannot
+    occur in a line. The fields of optional groups that did not match are
+    None; their positions are returned apart. Returns what `unshare_columns`
+    needs to read it back.
+    """
+    if not len(line_ids):
+        return None, 0, [], [], nlines, skipped
+    missing = [[k for k, value in enumerate(column) if value is None] if None in column else []
+               for column in columns]
+    blobs = [line_ids.tobytes()] + [
+        "\n".join(["" if value is None else value for value in column] if nones else column).encode("utf-8")
+        for column, nones in zip(columns, missing)
+    ]
+    sizes = [len(blob) for blob in blobs]
+    shared_memory = import_module("multiprocessing.shared_memory")
+    block = shared_memory.SharedMemory(create=True, size=sum(sizes))
+    offset = 0
+    for blob in blobs:
+        block.buf[offset:offset + len(blob)] = blob
+        offset += len(blob)
+    name = block.name
+    block.close()
+    return name, len(line_ids), sizes, missing, nlines, skipped
+
+
+def unshare_columns(shared):
+    """Reads back and frees the block of `share_columns`."""
+    name, count, sizes, missing, nlines, skipped = shared
+    if name is None:
+        return np.empty(0, dtype=np.int64), None, nlines, skipped
+    shared_memory = import_module("multiprocessing.shared_memory")
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        line_ids = np.frombuffer(block.buf, dtype=np.int64, count=count).copy()
+        columns = []
+        offset = sizes[0]
+        for size, nones in zip(sizes[1:], missing):
+            column = bytes(block.buf[offset:offset + size]).decode("utf-8").split("\n")
+            for k in nones:
+                column[k] = None
+            columns.append(column)
+            offset += size
+    finally:
+        block.close()
+        block.unlink()
+    return line_ids, columns, nlines, skipped
+
+
+def concat_ranges(results, ncolumns):
+    """Concatenates the results of consecutive ranges, numbering the lines
+    from the start of the file.
+    """
+    line_ids = []
+    columns = [[] for _ in range(ncolumns)]
+    nlines = 0
+    skipped, example = 0, None
+    for range_ids, range_columns, range_lines, (range_skipped, range_example) in results:
+        line_ids.append(range_ids + nlines)
+        if range_columns:
+            for column, values in zip(columns, range_columns):
+                column.extend(values)
+        nlines += range_lines
+        skipped += range_skipped
+        example = example or range_example
+    return np.concatenate(line_ids), columns, nlines, (skipped, example)
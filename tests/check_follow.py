@@ -0,0 +1,195 @@
+#check_follow.py：
+# Checks that logparser.utils.linereader.TailReader returns every complete
+# line of a growing log file once, across rotation, truncation in place, a
+# partial last line and a restart from a saved position, and that
+# LogGzip's follow() over a file written in pieces, stopped, interrupted,
+# restarted from its checkpoint and rotated gives the same tables as
+# following it in one go and as parse() of the whole file.
+import glob
+import os
+import shutil
+import sys
+import tempfile
+
+home = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(home)
+import pandas as pd
+from logparser.LogGzip import LogParser
+from logparser.LogGzip.compressors import DefaultCompressor
+from logparser.utils.linereader import TailReader
+
+input_dir = os.path.join(home, "data", "loghub_24")
+settings = {
+    "HDFS": {
+        "log_file": "HDFS/HDFS_2k.log",
+        "log_format": "<Date> <Time> <Pid> <Level> <Component>: <Content>",
+        "regex": [r"blk_-?\d+", r"(\d+\.){3}\d+(:\d+)?"],
+        "threshold": 0.1,
+        "mask_digits": True,
+        "delimiters": [r'\s+', r'\:'],
+    },
+    "Hadoop": {
+        "log_file": "Hadoop/Hadoop_2k.log",
+        "log_format": "<Date> <Time> <Level> \[<Process>\] <Component>: <Content>",
+        "regex": [r"(\d+\.){3}\d+"],
+        "threshold": 0.1,
+        "mask_digits": False,
+        "delimiters": [r'\s+', r'\_'],
+    },
+}
+
+
+def write(path, data, mode="ab"):
+    with open(path, mode) as fout:
+        fout.write(data)
+
+
+def read_all(reader):
+    lines = []
+    while True:
+        new_lines = reader.read()
+        if not new_lines:
+            return lines
+        lines += new_lines
+
+
+def check_tail_reader(tmp_dir):
+    """Returns the list of failed TailReader cases."""
+    failures = []
+
+    def expect(case, lines, expected):
+        if lines != expected:
+            failures.append(case)
+            print("  %s: %r != %r" % (case, lines, expected))
+
+    path = os.path.join(tmp_dir, "tail.log")
+    write(path, b"a\nb\r\nc", "wb")
+    reader = TailReader(path, chunk_size=4)
+    expect("partial last line", read_all(reader), ["a", "b"])
+    write(path, b"c\nd\n")
+    expect("completed last line", read_all(reader), ["cc", "d"])
+
+    write(path, b"e\n")
+    os.rename(path, path + ".1")
+    write(path + ".1", b"f\n")  # written to the old file after the rotation
+    write(path, b"g\nh", "wb")
+    expect("rotation", read_all(reader), ["e", "f", "g"])
+    os.rename(path, path + ".2")
+    write(path, b"i\n", "wb")
+    expect("rotation after a partial last line", read_all(reader), ["h", "i"])
+
+    offset, inode = reader.offset, reader.inode
+    reader.close()
+    write(path, b"j\nk\n")
+    expect("resume", read_all(TailReader(path, offset, inode)), ["j", "k"])
+    expect("resume on another file", read_all(TailReader(path + ".1", offset, inode)), ["a", "b", "cc", "d", "e", "f"])
+
+    reader = TailReader(path, offset, inode)
+    read_all(reader)
+    write(path, b"l\n", "r+b")
+    os.truncate(path, 2)
+    expect("truncation", read_all(reader), ["l"])
+    reader.close()
+
+    path = os.path.join(tmp_dir, "ends.log")
+    write(path, b"m\r\nn\ro\n\np\n", "wb")
+    reader = TailReader(path)
+    lines = reader.read()
+    for k, end in enumerate(reader.ends):
+        expect("resume after line %d" % (k + 1), read_all(TailReader(path, end, reader.ends_inode)), lines[k + 1:])
+    reader.close()
+    return failures
+
+
+def parser(indir, outdir, setting):
+    return LogParser(indir, outdir, setting["log_format"], compressor_instance=DefaultCompressor("gzip"),
+                     threshold=setting["threshold"], rex=setting["regex"], mask_digits=setting["mask_digits"],
+                     delimiters=setting["delimiters"])
+
+
+def interrupt(parser, nlines):
+    """Makes the parser raise KeyboardInterrupt instead of matching the line
+    after the first nlines.
+    """
+    match_content = parser.match_content
+
+    def interrupting(*args, **kwargs):
+        if parser.matched == nlines:
+            raise KeyboardInterrupt
+        parser.matched += 1
+        return match_content(*args, **kwargs)
+    parser.matched = 0
+    parser.match_content = interrupting
+
+
+def followed_rows(outdir, log_file):
+    parts = sorted(glob.glob(os.path.join(outdir, log_file + "_structured_*.csv")))
+    return pd.concat([pd.read_csv(part) for part in parts], ignore_index=True), len(parts)
+
+
+def check_follow(tmp_dir, setting):
+    """Returns whether following the log in pieces gives the tables of
+    following it in one go, and the templates and fields of parse().
+    A row gets its template as of the time its line is matched, so the
+    EventIds of parse() can differ where later lines generalized it.
+    """
+    with open(os.path.join(input_dir, setting["log_file"]), "rb") as fin:
+        lines = fin.read().splitlines(keepends=True)
+    if not lines[-1].endswith(b"\n"):
+        lines[-1] += b"\n"
+    log_file = os.path.basename(setting["log_file"])
+    indir = os.path.join(tmp_dir, "in")
+    os.makedirs(indir)
+    path = os.path.join(indir, log_file)
+    write(path, b"".join(lines), "wb")
+    parser(indir, os.path.join(tmp_dir, "parsed"), setting).parse(log_file)
+    parser(indir, os.path.join(tmp_dir, "whole"), setting).follow(log_file, poll_interval=0.01, idle_timeout=0.1)
+
+    outdir = os.path.join(tmp_dir, "pieces")
+    first, second = len(lines) // 3, 2 * len(lines) // 3
+    write(path, b"".join(lines[:first]) + lines[first][:10], "wb")
+    parser(indir, outdir, setting).follow(log_file, poll_interval=0.01, idle_timeout=0.1)
+    write(path, lines[first][10:] + b"".join(lines[first + 1:second]))
+    interrupted = parser(indir, outdir, setting)
+    interrupt(interrupted, 100)
+    try:
+        interrupted.follow(log_file, poll_interval=0.01, idle_timeout=0.1)
+    except KeyboardInterrupt:
+        pass
+    parser(indir, outdir, setting).follow(log_file, checkpoint_lines=100, poll_interval=0.01, idle_timeout=0.1)
+    os.rename(path, path + ".1")
+    write(path, b"".join(lines[second:]), "wb")
+    parser(indir, outdir, setting).follow(log_file, poll_interval=0.01, idle_timeout=0.1)
+
+    followed, nparts = followed_rows(outdir, log_file)
+    whole, _ = followed_rows(os.path.join(tmp_dir, "whole"), log_file)
+    parsed = pd.read_csv(os.path.join(tmp_dir, "parsed", log_file + "_structured.csv"))
+    fields = [column for column in parsed.columns if column not in ("EventId", "EventTemplate")]
+    same_rows = followed.equals(whole) and followed[fields].equals(parsed[fields])
+    same_templates = (pd.read_csv(os.path.join(outdir, log_file + "_templates.csv"))
+                      .equals(pd.read_csv(os.path.join(tmp_dir, "parsed", log_file + "_templates.csv"))))
+    print("%-30s %d parts, same rows: %s, same templates: %s" % (log_file, nparts, same_rows, same_templates))
+    return same_rows and same_templates
+
+
+if __name__ == "__main__":
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        failures = check_tail_reader(tmp_dir)
+        checked = 0
+        for dataset, setting in settings.items():
+            if not os.path.exists(os.path.join(input_dir, setting["log_file"])):
+                print("Missing %s" % os.path.join(input_dir, setting["log_file"]))
+                continue
+            checked += 1
+            if not check_follow(os.path.join(tmp_dir, dataset), setting):
+                failures.append(dataset)
+    finally:
+        shutil.rmtree(tmp_dir)
+    if failures:
+        print("Failed: %s" % ", ".join(failures))
+        sys.exit(1)
+    if not checked:
+        print("No log file found in %s" % input_dir)
+        sys.exit(1)
+    print("Following logs matches parsing them")
@@ -0,0 +1,125 @@
+#check_linereader.py：
+# Checks that logparser.utils.linereader.LineReader reads the same lines as
+# a text-mode file, that LineReader(path, start, end) reads the lines
+# starting in [start, end), and that the lines of consecutive byte ranges
+# add up to the lines of the whole file, on loghub_24 logs rewritten with
+# CRLF, LF and mixed line breaks, with and without a final line break.
+import bisect
+import io
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+
+home = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(home)
+from logparser.utils.linereader import LineReader
+
+input_dir = os.path.join(home, "data", "loghub_24")
+log_files = ["HDFS/HDFS_2k.log", "Hadoop/Hadoop_2k.log", "Windows/Windows_2k.log"]
+splits = 20  # random range splits of each file
+chunk_sizes = [1 << 20, 4096, 7]
+
+
+def variants(lines):
+    """(name, data) of the lines joined with various line breaks."""
+    mixed = b"".join(line + (b"\r\n", b"\n", b"\r")[k % 3] for k, line in enumerate(lines))
+    yield "crlf", b"\r\n".join(lines)
+    yield "crlf, final", b"\r\n".join(lines) + b"\r\n"
+    yield "lf", b"\n".join(lines)
+    yield "mixed", mixed
+    yield "empty lines", b"\r\n\r\n".join(lines) + b"\n\n"
+
+
+def text_lines(data):
+    """The lines of data read by a text-mode file."""
+    with io.StringIO(data.decode("utf-8"), newline=None) as fin:
+        return [line[:-1] if line.endswith("\n") else line for line in fin]
+
+
+def line_starts(data):
+    """Offsets of the lines of data; ranges are aligned on b"\\n"."""
+    return [0] + [match.end() for match in re.finditer(b"\n", data) if match.end() < len(data)]
+
+
+def range_lines(path, data, starts, bounds, chunk_size):
+    """Returns the lines of the consecutive ranges and the number of ranges
+    that are not the lines starting in them.
+    """
+    lines = []
+    mismatches = 0
+    for start, end in zip(bounds, bounds[1:]):
+        read = list(LineReader(path, start, end, chunk_size=chunk_size, encoding="utf-8"))
+        first, stop = [starts[k] if k < len(starts) else len(data)
+                       for k in (bisect.bisect_left(starts, start), bisect.bisect_left(starts, end))]
+        if read != text_lines(data[first:stop]):
+            mismatches += 1
+        lines += read
+    return lines, mismatches
+
+
+def check_file(rng, path, data):
+    """Returns the number of readings that differ from the text-mode file."""
+    expected = text_lines(data)
+    starts = line_starts(data)
+    mismatches = 0
+    for chunk_size in chunk_sizes:
+        if list(LineReader(path, chunk_size=chunk_size, encoding="utf-8")) != expected:
+            mismatches += 1
+            print("  whole file, chunk_size %d" % chunk_size)
+    for _ in range(splits):
+        cuts = sorted(rng.randint(0, len(data)) for _ in range(rng.randint(1, 16)))
+        # ranges may also end past the file
+        bounds = [0] + cuts + [len(data) + rng.randint(0, 2)]
+        chunk_size = rng.choice(chunk_sizes)
+        lines, wrong_ranges = range_lines(path, data, starts, bounds, chunk_size)
+        if lines != expected or wrong_ranges:
+            mismatches += 1
+            print("  ranges %r, chunk_size %d" % (bounds, chunk_size))
+    return mismatches
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    tmp_dir = tempfile.mkdtemp()
+    failures = 0
+    checked = 0
+    try:
+        small = [b"a", b"", b"bc", b"\xc3\xa9", b"d"]
+        for name, data in variants(small):
+            path = os.path.join(tmp_dir, "small.log")
+            with open(path, "wb") as fout:
+                fout.write(data)
+            # every split of a small file into two ranges
+            for cut in range(len(data) + 1):
+                for chunk_size in chunk_sizes:
+                    lines, wrong_ranges = range_lines(path, data, line_starts(data), [0, cut, len(data)], chunk_size)
+                    if lines != text_lines(data) or wrong_ranges:
+                        failures += 1
+                        print("  %s: ranges [0, %d, %d], chunk_size %d" % (name, cut, len(data), chunk_size))
+        for log_file in log_files:
+            source = os.path.join(input_dir, log_file)
+            if not os.path.exists(source):
+                print("Missing %s" % source)
+                continue
+            with open(source, "rb") as fin:
+                lines = fin.read().splitlines()
+            checked += 1
+            for name, data in variants(lines):
+                path = os.path.join(tmp_dir, os.path.basename(log_file))
+                with open(path, "wb") as fout:
+                    fout.write(data)
+                mismatches = check_file(rng, path, data)
+                failures += mismatches
+                print("%-30s %-12s %d bytes, %d mismatches" % (log_file, name, len(data), mismatches))
+    finally:
+        shutil.rmtree(tmp_dir)
+    if failures:
+        print("%d mismatches" % failures)
+        sys.exit(1)
+    if not checked:
+        print("No log file found in %s" % input_dir)
+        sys.exit(1)
+    print("Byte ranges add up to the whole file")
@@ -0,0 +1,79 @@
+#check_logformat.py：
+# Checks that the split extractor of logparser.utils.logformat.LogFormat
+# gives the same fields as the lazy format regex, on every line of the
+# loghub_24 datasets for every log format used by a benchmark, and on
+# randomly damaged copies of those lines.
+import os
+import random
+import sys
+
+home = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(home)
+from logparser.utils.logformat import LogFormat
+from logparser.utils.benchmark_loader import benchmark_formats
+
+input_dir = os.path.join(home, "data", "loghub_24")
+noise = [" ", "  ", "\t", "\x1c", "\n", ":", ": ", "|", "[", "]", "-", ",", "@", "x"]
+mutations_per_line = 2
+
+
+def mutate(rng, line):
+    chars = list(line)
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randint(0, len(chars))
+        if chars and rng.random() < 0.3:
+            del chars[min(position, len(chars) - 1)]
+        else:
+            chars.insert(position, rng.choice(noise))
+    return "".join(chars)
+
+
+def regex_fields(logformat, line):
+    match = logformat.regex.search(line)
+    return None if match is None else [match.group(header) for header in logformat.headers]
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    formats = benchmark_formats()
+    if not formats:
+        print("No log formats found in the parser benchmarks")
+        sys.exit(1)
+    failures = 0
+    checked = 0
+    for format_string, log_file in formats:
+        logformat = LogFormat(format_string)
+        path = os.path.join(input_dir, log_file)
+        if not os.path.exists(path):  # e.g. data/loghub_24/linux
+            directory, name = os.path.split(log_file)
+            path = os.path.join(input_dir, directory.lower(), name)
+        if not os.path.exists(path):
+            print("Missing %s" % path)
+            continue
+        with open(path) as fin:
+            lines = [line.strip() for line in fin]
+        lines += ["", " ", logformat.prefix or "x"]
+        if logformat.is_split:
+            # regex-only formats need no damaged lines, and their lazy regex
+            # can backtrack for minutes on them
+            lines += [mutate(rng, line) for line in lines for _ in range(mutations_per_line)]
+        checked += 1
+        mismatches = 0
+        for line in lines:
+            expected = regex_fields(logformat, line)
+            match = logformat.search(line)
+            searched = None if match is None else [match.group(header) for header in logformat.headers]
+            if logformat.extract(line) != expected or searched != expected:
+                mismatches += 1
+                if mismatches <= 3:
+                    print("  %r: %r != %r" % (line, logformat.extract(line), expected))
+        failures += mismatches
+        print("%-6s %-40s %-90s %d lines, %d mismatches" % (
+            "split" if logformat.is_split else "regex", log_file, format_string, len(lines), mismatches))
+    if failures:
+        print("%d mismatches" % failures)
+        sys.exit(1)
+    if not checked:
+        print("No log file found in %s" % input_dir)
+        sys.exit(1)
+    print("The split extractor matches the regex on all formats")
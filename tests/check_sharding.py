@@ -0,0 +1,94 @@
+#check_sharding.py：
+# Checks that LogGzip's sharded parallel matching, parse(workers > 1),
+# writes the same structured and templates tables as matching the lines
+# serially, on loghub_24 logs rewritten with CRLF line breaks and no final
+# line break.
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+
+home = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(home)
+from logparser.LogGzip import LogParser
+from logparser.LogGzip.compressors import DefaultCompressor
+
+input_dir = os.path.join(home, "data", "loghub_24")
+workers = [2, 3]
+settings = {
+    "HDFS": {
+        "log_file": "HDFS/HDFS_2k.log",
+        "log_format": "<Date> <Time> <Pid> <Level> <Component>: <Content>",
+        "regex": [r"blk_-?\d+", r"(\d+\.){3}\d+(:\d+)?"],
+        "threshold": 0.1,
+        "mask_digits": True,
+        "delimiters": [r'\s+', r'\:'],
+    },
+    "Hadoop": {
+        "log_file": "Hadoop/Hadoop_2k.log",
+        "log_format": "<Date> <Time> <Level> \[<Process>\] <Component>: <Content>",
+        "regex": [r"(\d+\.){3}\d+"],
+        "threshold": 0.1,
+        "mask_digits": False,
+        "delimiters": [r'\s+', r'\_'],
+    },
+    "Zookeeper": {
+        "log_file": "Zookeeper/Zookeeper_2k.log",
+        "log_format": "<Date> <Time> - <Level>  \[<Node>:<Component>@<Id>\] - <Content>",
+        "regex": [r"(/|)(\d+\.){3}\d+(:\d+)?"],
+        "threshold": 0.9,
+        "mask_digits": False,
+        "delimiters": [r'\s+'],
+    },
+}
+
+
+def parse(indir, outdir, log_file, setting, n_workers):
+    parser = LogParser(indir, outdir, setting["log_format"], compressor_instance=DefaultCompressor("gzip"),
+                       threshold=setting["threshold"], rex=setting["regex"], mask_digits=setting["mask_digits"],
+                       delimiters=setting["delimiters"])
+    parser.parse(log_file, workers=n_workers)
+    return [os.path.join(outdir, log_file + "_%s.csv" % table) for table in ("structured", "templates")]
+
+
+def check_sharding(tmp_dir, setting):
+    """Returns whether every number of workers gives the serial tables."""
+    with open(os.path.join(input_dir, setting["log_file"]), "rb") as fin:
+        lines = fin.read().splitlines()
+    log_file = os.path.basename(setting["log_file"])
+    indir = os.path.join(tmp_dir, "in")
+    os.makedirs(indir)
+    with open(os.path.join(indir, log_file), "wb") as fout:
+        fout.write(b"\r\n".join(lines))
+    serial = parse(indir, os.path.join(tmp_dir, "serial"), log_file, setting, 1)
+    same = True
+    for n_workers in workers:
+        sharded = parse(indir, os.path.join(tmp_dir, "workers_%d" % n_workers), log_file, setting, n_workers)
+        same_tables = all(filecmp.cmp(a, b, shallow=False) for a, b in zip(serial, sharded))
+        print("%-30s %d workers, same tables: %s" % (log_file, n_workers, same_tables))
+        same = same and same_tables
+    return same
+
+
+if __name__ == "__main__":
+    tmp_dir = tempfile.mkdtemp()
+    failures = []
+    checked = 0
+    try:
+        for dataset, setting in settings.items():
+            if not os.path.exists(os.path.join(input_dir, setting["log_file"])):
+                print("Missing %s" % os.path.join(input_dir, setting["log_file"]))
+                continue
+            checked += 1
+            if not check_sharding(os.path.join(tmp_dir, dataset), setting):
+                failures.append(dataset)
+    finally:
+        shutil.rmtree(tmp_dir)
+    if failures:
+        print("Failed: %s" % ", ".join(failures))
+        sys.exit(1)
+    if not checked:
+        print("No log file found in %s" % input_dir)
+        sys.exit(1)
+    print("Sharded matching gives the serial tables")
@@ -2,6 +2,10 @@
 
 home="$(pwd)/../logparser"
 
+echo "=== Testing log format compiler ===" && python check_logformat.py && \
+echo "=== Testing LogGzip log following ===" && python check_follow.py && \
+echo "=== Testing LogGzip sharded matching ===" && python check_sharding.py && \
+echo "=== Testing line reader ranges ===" && python check_linereader.py && \
 echo "=== Testing AEL ==="  && cd $home/AEL && python demo.py && \
 echo "=== Testing Drain ===" && cd $home/Drain && python demo.py && \
 echo "=== Testing IPLoM ===" && cd $home/IPLoM && python demo.py && \